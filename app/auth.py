@@ -4,22 +4,44 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
-from app import crud
-from app.database import get_db
+from app import crud, models
+from app.cache import TTLCache
+from app.database import AsyncSessionLocal, get_db, read_sessionmaker_for
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(PASSWORD_HASH_WORKERS)))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Проверенные токены (token -> claims) и снимки пользователей (user_id -> User).
+# Кэши у каждого воркера свои, а роль и активность меняются прямо в БД, поэтому
+# такие изменения применяются не позже чем через AUTH_CACHE_TTL_SECONDS
+token_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -29,6 +51,71 @@ def get_password_hash(password):
         password = password_bytes.decode('utf-8', errors='ignore')
     return pwd_context.hash(password)
 
+# bcrypt блокирует поток на 100–300 мс, поэтому в async-коде хэширование
+# выполняется в отдельном пуле, а число одновременных операций ограничено
+_hash_executor: Optional[Executor] = None
+_hash_semaphore: Optional[asyncio.Semaphore] = None
+_rehash_tasks = set()
+
+def _get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                thread_name_prefix="bcrypt",
+            )
+    return _hash_executor
+
+async def _run_hash_job(func, *args):
+    global _hash_semaphore
+    if _hash_semaphore is None:
+        _hash_semaphore = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+    
+    async with _hash_semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), func, *args)
+
+async def averify_password(plain_password, hashed_password):
+    return await _run_hash_job(verify_password, plain_password, hashed_password)
+
+async def aget_password_hash(password):
+    return await _run_hash_job(get_password_hash, password)
+
+async def _rehash_password(user_id: int, password: str):
+    try:
+        new_hash = await aget_password_hash(password)
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(models.User)
+                .where(models.User.id == user_id)
+                .values(hashed_password=new_hash)
+            )
+            await session.commit()
+        invalidate_user_cache(user_id)
+    except Exception as e:
+        print(f"Error in _rehash_password: {e}")
+
+def schedule_password_rehash(user_id: int, password: str, hashed_password: str):
+    """Перехэшировать пароль в фоне, если хэш устарел (например, сменился BCRYPT_ROUNDS)"""
+    if not pwd_context.needs_update(hashed_password):
+        return
+    
+    task = asyncio.create_task(_rehash_password(user_id, password))
+    _rehash_tasks.add(task)
+    task.add_done_callback(_rehash_tasks.discard)
+
+async def shutdown_password_hasher():
+    if _rehash_tasks:
+        await asyncio.gather(*_rehash_tasks, return_exceptions=True)
+    
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+        _hash_executor = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     
@@ -41,6 +128,53 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def _user_snapshot(user: models.User) -> models.User:
+    """Отсоединённая копия пользователя для кэша"""
+    return models.User(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        hashed_password=user.hashed_password,
+        is_active=user.is_active,
+        role=user.role,
+        created_at=user.created_at,
+    )
+
+def invalidate_user_cache(user_id: int):
+    """Сбросить закэшированный снимок пользователя в этом процессе"""
+    user_cache.pop(user_id)
+
+def get_auth_cache_stats() -> dict:
+    """Статистика кэшей: каждое попадание в user_cache — сэкономленный запрос к БД"""
+    return {
+        "tokens": token_cache.stats(),
+        "users": user_cache.stats(),
+        "db_round_trips_saved": user_cache.hits,
+    }
+
+def _decode_token(token: str) -> dict:
+    claims = token_cache.get(token)
+    if claims is not None:
+        if claims["exp"] > time.time():
+            return claims
+        token_cache.pop(token)
+        raise jwt.ExpiredSignatureError("Signature has expired.")
+    
+    payload = jwt.decode(
+        token, 
+        SECRET_KEY, 
+        algorithms=[ALGORITHM],
+        options={"verify_exp": True}
+    )
+    claims = {
+        "sub": payload.get("sub"),
+        "user_id": payload.get("user_id"),
+        "exp": payload.get("exp") or 0,
+    }
+    if claims["sub"] is not None and claims["user_id"] is not None:
+        token_cache.set(token, claims, ttl=claims["exp"] - time.time())
+    return claims
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
@@ -52,12 +186,7 @@ async def get_current_user(
     )
     
     try:
-        payload = jwt.decode(
-            token, 
-            SECRET_KEY, 
-            algorithms=[ALGORITHM],
-            options={"verify_exp": True}
-        )
+        payload = _decode_token(token)
         
         username: str = payload.get("sub")
         user_id = payload.get("user_id")
@@ -74,10 +203,15 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    user = user_cache.get(user_id)
+    if user is not None and user.username == username:
+        return user
+    
     user = await crud.get_user_by_username(db, username=username)
     if user is None:
         raise credentials_exception
     
+    user_cache.set(user.id, _user_snapshot(user))
     return user
 
 async def get_current_active_user(current_user = Depends(get_current_user)):
@@ -85,6 +219,14 @@ async def get_current_active_user(current_user = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_user_read_db(current_user = Depends(get_current_active_user)):
+    """Сессия для чтения: реплика или основная БД сразу после записи пользователя"""
+    async with read_sessionmaker_for(current_user.id)() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
 async def require_admin(current_user = Depends(get_current_active_user)):
     if current_user.role != "admin":
         raise HTTPException(
@@ -0,0 +1,80 @@
+from typing import Any, Iterable, List, Optional, Tuple
+import hashlib
+import os
+import time
+from dotenv import load_dotenv
+
+from app import responses, schemas
+from app.cache import TTLCache
+from app.database import READ_AFTER_WRITE_SECONDS
+
+load_dotenv()
+
+CARD_CACHE_TTL_SECONDS = float(os.getenv("CARD_CACHE_TTL_SECONDS", "30"))
+CARD_CACHE_MAX_SIZE = int(os.getenv("CARD_CACHE_MAX_SIZE", "1024"))
+
+# Версия каталога карточек: увеличивается при каждой записи через crud.
+# TTL ограничивает устаревание кэша в соседних процессах-воркерах.
+version = 0
+_changed_at = float("-inf")
+_pages = TTLCache(maxsize=CARD_CACHE_MAX_SIZE, ttl=CARD_CACHE_TTL_SECONDS)
+_cards = TTLCache(maxsize=CARD_CACHE_MAX_SIZE, ttl=CARD_CACHE_TTL_SECONDS)
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()
+
+def invalidate():
+    """Сбросить кэш каталога после изменения карточек"""
+    global version, _changed_at
+    version += 1
+    _changed_at = time.monotonic()
+    _pages.clear()
+    _cards.clear()
+
+def recently_changed() -> bool:
+    """Каталог менялся недавно, и реплика для чтения может ещё отставать"""
+    return time.monotonic() - _changed_at < READ_AFTER_WRITE_SECONDS
+
+def get_page(key: Tuple) -> Optional[Tuple[List[schemas.CardResponse], str]]:
+    """Страница каталога из кэша: (карточки, хэш содержимого)"""
+    return _pages.get((version, key))
+
+def set_page(
+    key: Tuple, cards: List[schemas.CardResponse], loaded_version: int
+) -> Tuple[List[schemas.CardResponse], str]:
+    # Хэш считается по готовому JSON: это быстрее repr() моделей
+    entry = (cards, hashlib.sha1(responses.card_list_adapter.dump_json(cards)).hexdigest())
+    # Не кэшируем данные, если каталог изменился во время загрузки
+    if loaded_version == version:
+        _pages.set((version, key), entry)
+    return entry
+
+def get_card(card_id: int) -> Optional[Tuple[schemas.CardResponse, str]]:
+    return _cards.get((version, card_id))
+
+def set_card(
+    card_id: int, card: schemas.CardResponse, loaded_version: int
+) -> Tuple[schemas.CardResponse, str]:
+    entry = (card, hashlib.sha1(responses.card_adapter.dump_json(card)).hexdigest())
+    if loaded_version == version:
+        _cards.set((version, card_id), entry)
+    return entry
+
+def make_etag(content_digest: str, user_part: Any = None) -> str:
+    """Слабый ETag: содержимое каталога + прогресс конкретного пользователя"""
+    return 'W/"%s"' % _digest((content_digest, user_part))[:32]
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    candidates: Iterable[str] = (tag.strip() for tag in if_none_match.split(","))
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in candidates:
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == opaque:
+            return True
+    return False
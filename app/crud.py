@@ -1,11 +1,19 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, and_, select, update, delete, or_
-from typing import List, Optional
+from sqlalchemy import func, and_, select, insert, update, delete, or_, text, bindparam, column, table, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
+import base64
+import bisect
+import json
 import random
+import sqlite3
 
-from app import models, schemas
-from app.auth import get_password_hash
+from app import catalog, grading, models, scheduler, schemas, writebehind
+from app.auth import aget_password_hash
+from app.database import mark_user_write
 
 # Пользователи
 async def get_user(db: AsyncSession, user_id: int) -> Optional[models.User]:
@@ -27,7 +35,7 @@ async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.Use
     return result.scalar_one_or_none()
 
 async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await aget_password_hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -45,31 +53,140 @@ async def get_card(db: AsyncSession, card_id: int) -> Optional[models.Card]:
     )
     return result.scalar_one_or_none()
 
-async def get_all_cards(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Card]:
-    """Получить все карточки"""
-    result = await db.execute(
-        select(models.Card)
-        .order_by(models.Card.created_at.desc())
-        .offset(skip)
-        .limit(limit)
+def encode_card_cursor(created_at: datetime, card_id: int) -> str:
+    """Непрозрачный курсор для keyset-пагинации по (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), card_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_card_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разобрать курсор; ValueError, если он повреждён"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, card_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(card_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+async def get_all_cards(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, int]] = None
+) -> List[models.Card]:
+    """Получить все карточки
+    
+    С курсором выборка продолжается после карточки (created_at, id)
+    по индексу ix_cards_created_at_id, и skip не используется.
+    """
+    query = select(models.Card).order_by(
+        models.Card.created_at.desc(),
+        models.Card.id.desc()
     )
+    
+    if cursor is not None:
+        created_at, card_id = cursor
+        # Сравнение строк (created_at, id) < (?, ?) — диапазон по индексу;
+        # эквивалентный OR SQLite выполняет обходом индекса от начала
+        query = query.where(
+            tuple_(models.Card.created_at, models.Card.id) < tuple_(
+                bindparam("cursor_created_at", created_at, type_=models.Card.created_at.type),
+                bindparam("cursor_id", card_id, type_=models.Card.id.type),
+            )
+        )
+    else:
+        query = query.offset(skip)
+    
+    result = await db.execute(query.limit(limit))
     return result.scalars().all()
 
+CARD_EXPORT_COLUMNS = [
+    "id", "foreign_word", "translation", "example_sentence", "language",
+    "difficulty_level", "created_by", "created_at", "updated_at",
+]
+
+async def stream_cards(
+    db: AsyncSession,
+    user_id: Optional[int] = None,
+    batch_size: int = 1000
+) -> AsyncIterator[dict]:
+    """Потоково выгрузить весь каталог через серверный курсор
+    
+    Если передан user_id, к каждой карточке присоединяется прогресс
+    пользователя (correct_answers, total_attempts).
+    """
+    columns = [getattr(models.Card, name) for name in CARD_EXPORT_COLUMNS]
+    query = select(*columns).order_by(models.Card.id)
+    
+    if user_id is not None:
+        query = query.add_columns(
+            models.UserCardProgress.correct_answers,
+            models.UserCardProgress.total_attempts,
+        ).outerjoin(
+            models.UserCardProgress,
+            and_(
+                models.UserCardProgress.card_id == models.Card.id,
+                models.UserCardProgress.user_id == user_id,
+                models.UserCardProgress.total_attempts > 0
+            )
+        )
+    
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for row in result.mappings():
+        yield dict(row)
+
 async def create_card(db: AsyncSession, card: schemas.CardCreate, admin_id: int) -> models.Card:
     """Создать карточку"""
+    await _add_to_card_counter(db, 1)
     db_card = models.Card(
         **card.dict(),
         created_by=admin_id
     )
     db.add(db_card)
+    await db.flush()
+    await _fts_index_cards(db, card_ids=[db_card.id])
     await db.commit()
+    catalog.invalidate()
+    mark_user_write(admin_id)
     await db.refresh(db_card)
+    grading.set_answers(db_card.id, db_card.translation)
     return db_card
 
+async def bulk_create_cards(
+    db: AsyncSession,
+    cards: List[schemas.CardCreate],
+    admin_id: int,
+    chunk_size: int = 1000
+) -> int:
+    """Вставить карточки пачками (executemany) в одной транзакции"""
+    if not cards:
+        return 0
+    
+    try:
+        await _add_to_card_counter(db, len(cards))
+        last_id = (await db.execute(select(func.max(models.Card.id)))).scalar() or 0
+        for start in range(0, len(cards), chunk_size):
+            chunk = cards[start:start + chunk_size]
+            await db.execute(
+                insert(models.Card),
+                [{**card.dict(), "created_by": admin_id} for card in chunk]
+            )
+        await _fts_index_cards(db, after_id=last_id)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    
+    # id вставленных карточек неизвестны: в индекс проверки ответов
+    # они догрузятся при первом ответе
+    catalog.invalidate()
+    mark_user_write(admin_id)
+    return len(cards)
+
 async def update_card(
     db: AsyncSession, 
     card_id: int, 
-    card_update: schemas.CardUpdate
+    card_update: schemas.CardUpdate,
+    admin_id: Optional[int] = None
 ) -> Optional[models.Card]:
     """Обновить карточку"""
     result = await db.execute(
@@ -86,23 +203,269 @@ async def update_card(
     
     db_card.updated_at = datetime.utcnow()
     
+    await db.flush()
+    await _fts_delete_cards(db, [card_id])
+    await _fts_index_cards(db, card_ids=[card_id])
     await db.commit()
+    catalog.invalidate()
+    if admin_id is not None:
+        mark_user_write(admin_id)
     await db.refresh(db_card)
+    grading.set_answers(db_card.id, db_card.translation)
     return db_card
 
-async def delete_card(db: AsyncSession, card_id: int) -> bool:
-    """Удалить карточку"""
-    result = await db.execute(
-        select(models.Card).where(models.Card.id == card_id)
+async def get_card_ids(
+    db: AsyncSession,
+    language: Optional[str] = None,
+    difficulty_level: Optional[int] = None
+) -> List[int]:
+    """id карточек, подходящих под фильтр"""
+    query = select(models.Card.id).order_by(models.Card.id)
+    if language is not None:
+        query = query.where(models.Card.language == language)
+    if difficulty_level is not None:
+        query = query.where(models.Card.difficulty_level == difficulty_level)
+    
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+async def _subtract_deleted_progress(db: AsyncSession, card_ids: List[int]) -> None:
+    """Вычесть прогресс по удаляемым карточкам из сводок user_stats"""
+    progress = models.UserCardProgress
+    stats = models.UserStats
+    
+    def removed(column):
+        return (
+            select(func.coalesce(func.sum(column), 0))
+            .where(progress.user_id == stats.user_id, progress.card_id.in_(card_ids))
+            .scalar_subquery()
+        )
+    
+    await db.execute(
+        update(stats)
+        .where(stats.user_id.in_(
+            select(progress.user_id).where(progress.card_id.in_(card_ids))
+        ))
+        .values(
+            total_reviews=stats.total_reviews - removed(progress.total_attempts),
+            total_correct=stats.total_correct - removed(progress.correct_answers),
+            updated_at=func.now(),
+        )
     )
-    db_card = result.scalar_one_or_none()
+
+async def _lower_new_card_pointers(db: AsyncSession) -> None:
+    """Опустить указатели новых карточек до текущего максимального id
     
-    if not db_card:
+    SQLite может выдать новой карточке id удалённой последней карточки:
+    указатель за ним пропустил бы её.
+    """
+    pointer = models.NewCardPointer
+    max_card_id = (await db.execute(select(func.max(models.Card.id)))).scalar() or 0
+    await db.execute(
+        update(pointer)
+        .where(pointer.last_card_id > max_card_id)
+        .values(last_card_id=max_card_id)
+    )
+
+DELETE_CHUNK_SIZE = 500
+
+async def delete_cards(
+    db: AsyncSession,
+    card_ids: Optional[List[int]] = None,
+    language: Optional[str] = None,
+    difficulty_level: Optional[int] = None,
+    chunk_size: int = DELETE_CHUNK_SIZE,
+    admin_id: Optional[int] = None
+) -> List[int]:
+    """Удалить карточки по списку id или по фильтру одной транзакцией
+    
+    Всё делается запросами DELETE/UPDATE ... WHERE card_id IN (...) пачками
+    по chunk_size id: прогресс удаляется явно (в старых схемах нет
+    ON DELETE CASCADE), сводки уменьшаются на стороне БД, поэтому число
+    строк прогресса не влияет на работу в Python. Возвращает id удалённых.
+    """
+    if card_ids is None:
+        if language is None and difficulty_level is None:
+            raise ValueError("card_ids or a filter is required")
+        card_ids = await get_card_ids(db, language=language, difficulty_level=difficulty_level)
+    
+    progress = models.UserCardProgress
+    deleted = []
+    
+    try:
+        for start in range(0, len(card_ids), chunk_size):
+            chunk = list((await db.execute(
+                select(models.Card.id).where(models.Card.id.in_(card_ids[start:start + chunk_size]))
+            )).scalars().all())
+            if not chunk:
+                continue
+            
+            await _add_to_card_counter(db, -len(chunk))
+            await _subtract_deleted_progress(db, chunk)
+            await db.execute(
+                delete(progress)
+                .where(progress.card_id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            )
+            await _fts_delete_cards(db, chunk)
+            await db.execute(
+                delete(models.Card)
+                .where(models.Card.id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            )
+            deleted.extend(chunk)
+        
+        if deleted:
+            await _lower_new_card_pointers(db)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    
+    if deleted:
+        catalog.invalidate()
+        grading.discard(deleted)
+        writebehind.discard_cards(deleted)
+        if admin_id is not None:
+            mark_user_write(admin_id)
+    return deleted
+
+async def delete_card(db: AsyncSession, card_id: int, admin_id: Optional[int] = None) -> bool:
+    """Удалить карточку"""
+    return bool(await delete_cards(db, card_ids=[card_id], admin_id=admin_id))
+
+# Поиск
+_fts_available: Dict[str, bool] = {}
+
+async def _has_cards_fts(db: AsyncSession) -> bool:
+    """Есть ли в этой SQLite-базе FTS5-таблица карточек (результат кэшируется)"""
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite":
         return False
     
-    await db.delete(db_card)
-    await db.commit()
-    return True
+    key = str(bind.engine.url)
+    if key not in _fts_available:
+        result = await db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": models.CARDS_FTS_TABLE}
+        )
+        _fts_available[key] = result.scalar() is not None
+    return _fts_available[key]
+
+async def _fts_index_cards(
+    db: AsyncSession,
+    card_ids: Optional[List[int]] = None,
+    after_id: Optional[int] = None
+) -> None:
+    """Проиндексировать карточки из cards в FTS5 (в текущей транзакции)"""
+    if not await _has_cards_fts(db):
+        return
+    
+    statement = (
+        f"INSERT INTO {models.CARDS_FTS_TABLE} (rowid, foreign_word, translation, example_sentence) "
+        "SELECT id, foreign_word, translation, coalesce(example_sentence, '') FROM cards "
+    )
+    if card_ids is not None:
+        await db.execute(
+            text(statement + "WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": card_ids}
+        )
+    else:
+        await db.execute(text(statement + "WHERE id > :after_id"), {"after_id": after_id or 0})
+
+async def _fts_delete_cards(db: AsyncSession, card_ids: List[int]) -> None:
+    if not card_ids or not await _has_cards_fts(db):
+        return
+    
+    await db.execute(
+        text(f"DELETE FROM {models.CARDS_FTS_TABLE} WHERE rowid IN :ids").bindparams(
+            bindparam("ids", expanding=True)
+        ),
+        {"ids": card_ids}
+    )
+
+async def rebuild_card_search_index(db: AsyncSession) -> None:
+    """Перестроить FTS5-индекс карточек целиком"""
+    if not await _has_cards_fts(db):
+        return
+    
+    try:
+        await db.execute(text(f"DELETE FROM {models.CARDS_FTS_TABLE}"))
+        await _fts_index_cards(db, after_id=0)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+def _fts_match_expression(query: Optional[str], prefix: Optional[str]) -> str:
+    """Запрос FTS5: все слова query (И) и префикс начала foreign_word"""
+    parts = ['"%s"' % token.replace('"', '""') for token in (query or "").split()]
+    if prefix:
+        parts.append('foreign_word : ^"%s"*' % prefix.replace('"', '""'))
+    return " ".join(parts)
+
+def _like_pattern(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+async def search_cards(
+    db: AsyncSession,
+    query: Optional[str] = None,
+    language: Optional[str] = None,
+    difficulty_level: Optional[int] = None,
+    prefix: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20
+) -> List[models.Card]:
+    """Поиск карточек с фильтрами
+    
+    Текстовый запрос ищет по foreign_word, translation и example_sentence
+    через FTS5 (SQLite) или tsvector (PostgreSQL) с ранжированием;
+    без запроса — фильтрованный список в порядке каталога.
+    """
+    query = (query or "").strip() or None
+    prefix = (prefix or "").strip() or None
+    
+    stmt = select(models.Card)
+    if language:
+        stmt = stmt.where(models.Card.language == language)
+    if difficulty_level is not None:
+        stmt = stmt.where(models.Card.difficulty_level == difficulty_level)
+    
+    dialect = db.get_bind().dialect.name
+    
+    if (query or prefix) and await _has_cards_fts(db):
+        fts = table(models.CARDS_FTS_TABLE, column("rowid"), column("rank"))
+        stmt = (
+            stmt.join(fts, fts.c.rowid == models.Card.id)
+            .where(text(f"{models.CARDS_FTS_TABLE} MATCH :match").bindparams(
+                match=_fts_match_expression(query, prefix)
+            ))
+            .order_by(fts.c.rank, models.Card.id)
+        )
+    else:
+        if prefix:
+            stmt = stmt.where(models.Card.foreign_word.ilike(_like_pattern(prefix) + "%", escape="\\"))
+        
+        if query and dialect == "postgresql":
+            document = literal_column(models.CARD_SEARCH_DOCUMENT_SQL)
+            ts_query = func.plainto_tsquery(literal_column("'simple'"), query)
+            stmt = stmt.where(document.op("@@")(ts_query)).order_by(
+                func.ts_rank(document, ts_query).desc(), models.Card.id
+            )
+        else:
+            if query:
+                pattern = "%" + _like_pattern(query) + "%"
+                stmt = stmt.where(
+                    or_(
+                        models.Card.foreign_word.ilike(pattern, escape="\\"),
+                        models.Card.translation.ilike(pattern, escape="\\"),
+                        models.Card.example_sentence.ilike(pattern, escape="\\"),
+                    )
+                )
+            stmt = stmt.order_by(models.Card.created_at.desc(), models.Card.id.desc())
+    
+    result = await db.execute(stmt.offset(skip).limit(limit))
+    return result.scalars().all()
 
 # Прогресс
 async def get_or_create_user_progress(
@@ -143,20 +506,340 @@ async def update_user_progress(
     is_correct: bool
 ) -> Optional[models.UserCardProgress]:
     """Обновить прогресс пользователя по карточке"""
-    progress = await get_or_create_user_progress(db, user_id, card_id)
+    await apply_progress_outcomes(db, {(user_id, card_id): [is_correct]})
     
-    if not progress:
-        return None
+    result = await db.execute(
+        select(models.UserCardProgress).where(
+            and_(
+                models.UserCardProgress.user_id == user_id,
+                models.UserCardProgress.card_id == card_id
+            )
+        )
+    )
+    return result.scalar_one_or_none()
+
+async def _get_review_states(
+    db: AsyncSession,
+    keys: List[Tuple[int, int]]
+) -> Dict[Tuple[int, int], scheduler.ReviewState]:
+    """Текущее состояние расписания для пар (user_id, card_id)"""
+    progress = models.UserCardProgress
+    result = await db.execute(
+        select(
+            progress.user_id,
+            progress.card_id,
+            progress.interval_days,
+            progress.ease,
+            progress.streak,
+        ).where(
+            and_(
+                # IN по отдельным столбцам даёт поиск по индексу unique_user_card,
+                # сравнение кортежей оставляет ровно эти пары, а не все сочетания
+                progress.user_id.in_({user_id for user_id, _ in keys}),
+                progress.card_id.in_({card_id for _, card_id in keys}),
+                tuple_(progress.user_id, progress.card_id).in_(keys)
+            )
+        )
+    )
+    
+    return {
+        (row.user_id, row.card_id): scheduler.ReviewState(
+            interval_days=row.interval_days or 0,
+            ease=row.ease or scheduler.DEFAULT_EASE,
+            streak=row.streak or 0,
+        )
+        for row in result
+    }
+
+def _upsert_statement(db: AsyncSession, model, rows: List[dict]):
+    """INSERT ... ON CONFLICT для текущего диалекта (SQLite и PostgreSQL)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite_insert(model).values(rows)
+    if dialect == "postgresql":
+        return postgresql_insert(model).values(rows)
+    return None
+
+# Сводки статистики
+CARDS_COUNTER = "cards"
+
+async def _ensure_card_counter(db: AsyncSession) -> None:
+    """Создать счётчик карточек из COUNT(*), если его ещё нет"""
+    exists = await db.execute(
+        select(models.Counter.value).where(models.Counter.name == CARDS_COUNTER)
+    )
+    if exists.scalar_one_or_none() is not None:
+        return
+    
+    total_cards = (await db.execute(select(func.count(models.Card.id)))).scalar() or 0
+    stmt = _upsert_statement(db, models.Counter, [{"name": CARDS_COUNTER, "value": total_cards}])
+    if stmt is not None:
+        await db.execute(stmt.on_conflict_do_nothing(index_elements=["name"]))
+    else:
+        db.add(models.Counter(name=CARDS_COUNTER, value=total_cards))
+        await db.flush()
+
+async def _add_to_card_counter(db: AsyncSession, delta: int) -> None:
+    """Изменить счётчик карточек в текущей транзакции (до вставки/удаления)"""
+    await _ensure_card_counter(db)
+    await db.execute(
+        update(models.Counter)
+        .where(models.Counter.name == CARDS_COUNTER)
+        .values(value=models.Counter.value + delta)
+    )
+
+async def _ensure_user_stats(db: AsyncSession, user_ids: List[int]) -> None:
+    """Создать недостающие сводки пользователей из уже накопленного прогресса"""
+    result = await db.execute(
+        select(models.UserStats.user_id).where(models.UserStats.user_id.in_(user_ids))
+    )
+    missing = set(user_ids) - set(result.scalars().all())
+    if not missing:
+        return
+    
+    sums = await db.execute(
+        select(
+            models.UserCardProgress.user_id,
+            func.coalesce(func.sum(models.UserCardProgress.total_attempts), 0),
+            func.coalesce(func.sum(models.UserCardProgress.correct_answers), 0),
+        )
+        .where(models.UserCardProgress.user_id.in_(missing))
+        .group_by(models.UserCardProgress.user_id)
+    )
+    totals = {user_id: (reviews, correct) for user_id, reviews, correct in sums}
+    rows = [
+        {
+            "user_id": user_id,
+            "total_reviews": totals.get(user_id, (0, 0))[0],
+            "total_correct": totals.get(user_id, (0, 0))[1],
+        }
+        for user_id in sorted(missing)
+    ]
     
-    progress.total_attempts += 1
-    if is_correct:
-        progress.correct_answers += 1
+    stmt = _upsert_statement(db, models.UserStats, rows)
+    if stmt is not None:
+        await db.execute(stmt.on_conflict_do_nothing(index_elements=["user_id"]))
+    else:
+        db.add_all(models.UserStats(**row) for row in rows)
+        await db.flush()
+
+async def _add_to_user_stats(db: AsyncSession, rows: List[dict]) -> None:
+    """Увеличить сводки пользователей на приращения из rows"""
+    deltas: Dict[int, List[int]] = {}
+    for row in rows:
+        delta = deltas.setdefault(row["user_id"], [0, 0])
+        delta[0] += row["total_attempts"]
+        delta[1] += row["correct_answers"]
     
-    progress.updated_at = datetime.utcnow()
+    await _ensure_user_stats(db, list(deltas))
     
-    await db.commit()
-    await db.refresh(progress)
-    return progress
+    for user_id, (reviews, correct) in deltas.items():
+        await db.execute(
+            update(models.UserStats)
+            .where(models.UserStats.user_id == user_id)
+            .values(
+                total_reviews=models.UserStats.total_reviews + reviews,
+                total_correct=models.UserStats.total_correct + correct,
+                updated_at=func.now(),
+            )
+        )
+
+async def rebuild_progress_rollups(db: AsyncSession) -> dict:
+    """Пересчитать сводки статистики и счётчик карточек с нуля"""
+    try:
+        await db.execute(delete(models.UserStats))
+        await db.execute(
+            insert(models.UserStats).from_select(
+                ["user_id", "total_reviews", "total_correct"],
+                select(
+                    models.UserCardProgress.user_id,
+                    func.coalesce(func.sum(models.UserCardProgress.total_attempts), 0),
+                    func.coalesce(func.sum(models.UserCardProgress.correct_answers), 0),
+                ).group_by(models.UserCardProgress.user_id)
+            )
+        )
+        await db.execute(delete(models.Counter).where(models.Counter.name == CARDS_COUNTER))
+        await _ensure_card_counter(db)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    
+    users = (await db.execute(select(func.count()).select_from(models.UserStats))).scalar() or 0
+    cards = (await db.execute(
+        select(models.Counter.value).where(models.Counter.name == CARDS_COUNTER)
+    )).scalar() or 0
+    return {"users": users, "total_cards": cards}
+
+async def verify_progress_rollups(db: AsyncSession) -> List[dict]:
+    """Сравнить сводки с фактическими данными; вернуть расхождения"""
+    mismatches = []
+    
+    actual_cards = (await db.execute(select(func.count(models.Card.id)))).scalar() or 0
+    stored_cards = (await db.execute(
+        select(models.Counter.value).where(models.Counter.name == CARDS_COUNTER)
+    )).scalar_one_or_none()
+    if stored_cards is not None and stored_cards != actual_cards:
+        mismatches.append({"counter": CARDS_COUNTER, "stored": stored_cards, "actual": actual_cards})
+    
+    actual = await db.execute(
+        select(
+            models.UserCardProgress.user_id,
+            func.coalesce(func.sum(models.UserCardProgress.total_attempts), 0),
+            func.coalesce(func.sum(models.UserCardProgress.correct_answers), 0),
+        ).group_by(models.UserCardProgress.user_id)
+    )
+    actual_totals = {user_id: (reviews, correct) for user_id, reviews, correct in actual}
+    
+    stored = await db.execute(
+        select(
+            models.UserStats.user_id,
+            models.UserStats.total_reviews,
+            models.UserStats.total_correct,
+        )
+    )
+    for user_id, reviews, correct in stored:
+        expected = actual_totals.get(user_id, (0, 0))
+        if (reviews, correct) != expected:
+            mismatches.append({
+                "user_id": user_id,
+                "stored": [reviews, correct],
+                "actual": list(expected),
+            })
+    
+    return mismatches
+
+# Строк в одном INSERT: у каждой 8 параметров, а SQLite до 3.32 принимает
+# не больше 999 параметров на запрос (новые SQLite и asyncpg — 32766)
+PROGRESS_CHUNK_ROWS = 1000
+
+def _progress_chunk_rows(db: AsyncSession, columns: int) -> int:
+    max_params = 32766
+    if db.get_bind().dialect.name == "sqlite" and sqlite3.sqlite_version_info < (3, 32, 0):
+        max_params = 999
+    return max(1, min(PROGRESS_CHUNK_ROWS, max_params // columns))
+
+async def _apply_progress_chunk(
+    db: AsyncSession,
+    outcomes: Dict[Tuple[int, int], List[bool]],
+    now: datetime
+) -> Set[int]:
+    """Записать пачку результатов; вернуть id карточек, которых уже нет"""
+    progress = models.UserCardProgress
+    card_ids = {card_id for _, card_id in outcomes}
+    existing = set((await db.execute(
+        select(models.Card.id).where(models.Card.id.in_(card_ids))
+    )).scalars().all())
+    missing = card_ids - existing
+    outcomes = {key: results for key, results in outcomes.items() if key[1] in existing}
+    if not outcomes:
+        return missing
+    
+    states = await _get_review_states(db, list(outcomes))
+    
+    rows = []
+    for (user_id, card_id), results in outcomes.items():
+        state = scheduler.review_many(
+            states.get((user_id, card_id), scheduler.ReviewState()), results, now
+        )
+        rows.append({
+            "user_id": user_id,
+            "card_id": card_id,
+            "total_attempts": len(results),
+            "correct_answers": sum(1 for is_correct in results if is_correct),
+            "due_at": state.due_at,
+            "interval_days": state.interval_days,
+            "ease": state.ease,
+            "streak": state.streak,
+        })
+    
+    await _add_to_user_stats(db, rows)
+    
+    stmt = _upsert_statement(db, progress, rows)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "card_id"],
+            set_={
+                "total_attempts": progress.total_attempts + stmt.excluded.total_attempts,
+                "correct_answers": progress.correct_answers + stmt.excluded.correct_answers,
+                "due_at": stmt.excluded.due_at,
+                "interval_days": stmt.excluded.interval_days,
+                "ease": stmt.excluded.ease,
+                "streak": stmt.excluded.streak,
+                "updated_at": func.now(),
+            }
+        )
+        await db.execute(stmt)
+        return missing
+    
+    for row in rows:
+        result = await db.execute(
+            update(progress)
+            .where(
+                and_(
+                    progress.user_id == row["user_id"],
+                    progress.card_id == row["card_id"]
+                )
+            )
+            .values(
+                total_attempts=progress.total_attempts + row["total_attempts"],
+                correct_answers=progress.correct_answers + row["correct_answers"],
+                due_at=row["due_at"],
+                interval_days=row["interval_days"],
+                ease=row["ease"],
+                streak=row["streak"],
+                updated_at=func.now(),
+            )
+        )
+        if result.rowcount == 0:
+            db.add(progress(**row))
+    return missing
+
+async def apply_progress_outcomes(
+    db: AsyncSession,
+    outcomes: Dict[Tuple[int, int], List[bool]]
+) -> Set[int]:
+    """Применить результаты ответов к прогрессу одной транзакцией
+    
+    outcomes — словарь (user_id, card_id) -> список результатов ответов
+    в порядке их поступления. Счётчики увеличиваются на стороне БД
+    (ON CONFLICT DO UPDATE), поэтому одновременные отправки одного
+    пользователя не теряют ответы. Большие пакеты записываются
+    несколькими INSERT, чтобы не превысить лимит параметров драйвера.
+    
+    Ответы по уже удалённым карточкам (в том числе в другом воркере)
+    пропускаются; возвращаются id таких карточек.
+    """
+    outcomes = {key: results for key, results in outcomes.items() if results}
+    if not outcomes:
+        return set()
+    
+    now = datetime.utcnow().replace(microsecond=0)
+    items = list(outcomes.items())
+    chunk_rows = _progress_chunk_rows(db, columns=8)
+    
+    # Карточку могут удалить между проверкой и записью: тогда внешний ключ
+    # отклонит запись, и повторная попытка проверит карточки заново
+    for attempt in range(2):
+        missing = set()
+        try:
+            for start in range(0, len(items), chunk_rows):
+                missing |= await _apply_progress_chunk(db, dict(items[start:start + chunk_rows]), now)
+            await db.commit()
+            break
+        except IntegrityError:
+            await db.rollback()
+            if attempt:
+                raise
+        except Exception:
+            await db.rollback()
+            raise
+    
+    if missing:
+        grading.discard(missing)
+    for user_id in {user_id for user_id, card_id in outcomes if card_id not in missing}:
+        mark_user_write(user_id)
+    return missing
 
 async def get_user_progress_for_card(
     db: AsyncSession,
@@ -168,7 +851,9 @@ async def get_user_progress_for_card(
         select(models.UserCardProgress).where(
             and_(
                 models.UserCardProgress.user_id == user_id,
-                models.UserCardProgress.card_id == card_id
+                models.UserCardProgress.card_id == card_id,
+                # Выданные, но ещё без ответов карточки прогресса не имеют
+                models.UserCardProgress.total_attempts > 0
             )
         )
     )
@@ -181,60 +866,280 @@ async def get_user_progress_for_card(
         }
     return None
 
+async def get_user_progress_for_cards(
+    db: AsyncSession,
+    user_id: int,
+    card_ids: List[int]
+) -> Dict[int, dict]:
+    """Получить прогресс пользователя по набору карточек одним запросом"""
+    if not card_ids:
+        return {}
+    
+    result = await db.execute(
+        select(
+            models.UserCardProgress.card_id,
+            models.UserCardProgress.correct_answers,
+            models.UserCardProgress.total_attempts,
+        ).where(
+            and_(
+                models.UserCardProgress.user_id == user_id,
+                models.UserCardProgress.card_id.in_(set(card_ids)),
+                models.UserCardProgress.total_attempts > 0
+            )
+        )
+    )
+    
+    return {
+        row.card_id: {
+            "correct_answers": row.correct_answers,
+            "total_attempts": row.total_attempts
+        }
+        for row in result
+    }
+
+def _sample_weighted_card_ids(
+    rows: List[Tuple[int, int]],
+    limit: int,
+    rng: random.Random = random
+) -> List[int]:
+    """Выбрать id карточек по парам (card_id, attempts) с весами int(10 / (attempts + 1))"""
+    card_ids = [card_id for card_id, _ in rows]
+    bounds = []
+    total_weight = 0
+    for _, attempts in rows:
+        total_weight += int(10 / (attempts + 1))
+        bounds.append(total_weight)
+    
+    if total_weight == 0:
+        return rng.sample(card_ids, min(limit, len(card_ids)))
+    
+    positions = rng.sample(range(total_weight), min(limit, total_weight))
+    return [card_ids[bisect.bisect_right(bounds, pos)] for pos in positions]
+
 async def get_random_cards_for_user(
     db: AsyncSession, 
     user_id: int, 
     limit: int = 10
 ) -> List[models.Card]:
-    """Получить случайные карточки для теста пользователя"""
-    result = await db.execute(select(models.Card))
-    all_cards = result.scalars().all()
+    """Получить случайные карточки для теста пользователя
     
-    if not all_cards:
+    Каждая карточка получает вес int(10 / (attempts + 1)) — столько «копий»
+    карточки участвует в выборке без возвращения. Копии не материализуются:
+    выбираются позиции в диапазоне суммарного веса и сопоставляются
+    карточкам через префиксные суммы, поэтому распределение совпадает
+    с random.sample по списку копий, а запросов всего два.
+    """
+    result = await db.execute(
+        select(
+            models.Card.id,
+            func.coalesce(models.UserCardProgress.total_attempts, 0)
+        )
+        .outerjoin(
+            models.UserCardProgress,
+            and_(
+                models.UserCardProgress.card_id == models.Card.id,
+                models.UserCardProgress.user_id == user_id
+            )
+        )
+        .order_by(models.Card.id)
+    )
+    rows = result.all()
+    
+    if not rows:
         return []
     
-    weighted_cards = []
+    chosen_ids = _sample_weighted_card_ids(rows, limit)
     
-    for card in all_cards:
-        progress_result = await db.execute(
-            select(models.UserCardProgress).where(
+    cards_result = await db.execute(
+        select(models.Card).where(models.Card.id.in_(set(chosen_ids)))
+    )
+    cards_by_id = {card.id: card for card in cards_result.scalars().all()}
+    
+    return [cards_by_id[card_id] for card_id in chosen_ids if card_id in cards_by_id]
+
+async def introduce_new_cards(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 10,
+    now: Optional[datetime] = None
+) -> List[models.Card]:
+    """Выдать пользователю следующие ещё не изученные карточки
+    
+    Для них создаются строки прогресса со сроком now («сейчас»), поэтому
+    дальше они попадают в выборку просроченных. Каталог обходится по id от
+    указателя new_card_pointers, который только растёт: уже изученные
+    карточки пропускаются один раз, а не при каждом запросе.
+    """
+    progress = models.UserCardProgress
+    pointer = models.NewCardPointer
+    
+    try:
+        last_card_id = (await db.execute(
+            select(pointer.last_card_id).where(pointer.user_id == user_id)
+        )).scalar_one_or_none() or 0
+        # Карточки с большими id, созданные после этого запроса, выдадутся в следующий раз
+        max_card_id = (await db.execute(select(func.max(models.Card.id)))).scalar() or 0
+        if last_card_id >= max_card_id:
+            return []
+        
+        studied = select(progress.id).where(
+            and_(
+                progress.user_id == user_id,
+                progress.card_id == models.Card.id
+            )
+        )
+        result = await db.execute(
+            select(models.Card)
+            .where(
                 and_(
-                    models.UserCardProgress.user_id == user_id,
-                    models.UserCardProgress.card_id == card.id
+                    models.Card.id > last_card_id,
+                    models.Card.id <= max_card_id,
+                    ~studied.exists()
                 )
             )
+            .order_by(models.Card.id)
+            .limit(limit)
         )
-        progress = progress_result.scalar_one_or_none()
+        cards = list(result.scalars().all())
+        # Если карточек меньше limit, весь остаток каталога уже изучен
+        new_last_card_id = cards[-1].id if len(cards) == limit else max_card_id
         
-        attempts = progress.total_attempts if progress else 0
-        weight = 10 / (attempts + 1)
+        if now is None:
+            now = datetime.utcnow().replace(microsecond=0)
+        rows = [
+            {
+                "user_id": user_id,
+                "card_id": card.id,
+                "correct_answers": 0,
+                "total_attempts": 0,
+                "due_at": now,
+                "interval_days": 0,
+                "ease": scheduler.DEFAULT_EASE,
+                "streak": 0,
+            }
+            for card in cards
+        ]
         
-        weighted_cards.extend([card] * int(weight))
+        pointer_stmt = _upsert_statement(
+            db, pointer, [{"user_id": user_id, "last_card_id": new_last_card_id}]
+        )
+        if pointer_stmt is not None:
+            if rows:
+                await db.execute(
+                    _upsert_statement(db, progress, rows)
+                    .on_conflict_do_nothing(index_elements=["user_id", "card_id"])
+                )
+            await db.execute(
+                pointer_stmt.on_conflict_do_update(
+                    index_elements=["user_id"],
+                    set_={"last_card_id": pointer_stmt.excluded.last_card_id},
+                    where=pointer.last_card_id < pointer_stmt.excluded.last_card_id,
+                )
+            )
+        else:
+            db.add_all(progress(**row) for row in rows)
+            db_pointer = await db.get(pointer, user_id)
+            if db_pointer is None:
+                db.add(pointer(user_id=user_id, last_card_id=new_last_card_id))
+            else:
+                db_pointer.last_card_id = max(db_pointer.last_card_id, new_last_card_id)
+        
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
     
-    if not weighted_cards:
-        return random.sample(all_cards, min(limit, len(all_cards)))
+    mark_user_write(user_id)
+    return cards
+
+async def get_due_cards_for_user(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 10,
+    write_db: Optional[AsyncSession] = None
+) -> List[models.Card]:
+    """Получить карточки для повторения по расписанию
+    
+    Сначала просроченные карточки (диапазон по индексу (user_id, due_at)),
+    затем новые карточки из introduce_new_cards (они записываются через
+    write_db, если чтение идёт с реплики), затем ближайшие к сроку.
+    Каждый шаг — запрос с LIMIT, независимо от размера каталога. Все шаги
+    используют одно и то же now, а уже выбранные карточки в последний шаг
+    не попадают.
+    """
+    progress = models.UserCardProgress
+    now = datetime.utcnow().replace(microsecond=0)
     
-    return random.sample(weighted_cards, min(limit, len(weighted_cards)))
+    result = await db.execute(
+        select(models.Card)
+        .join(progress, progress.card_id == models.Card.id)
+        .where(
+            and_(
+                progress.user_id == user_id,
+                progress.due_at <= now
+            )
+        )
+        .order_by(progress.due_at)
+        .limit(limit)
+    )
+    cards = list(result.scalars().all())
+    
+    if len(cards) < limit:
+        cards.extend(await introduce_new_cards(write_db or db, user_id, limit - len(cards), now=now))
+    
+    if len(cards) < limit:
+        result = await db.execute(
+            select(models.Card)
+            .join(progress, progress.card_id == models.Card.id)
+            .where(
+                and_(
+                    progress.user_id == user_id,
+                    progress.due_at > now,
+                    progress.card_id.notin_([card.id for card in cards])
+                )
+            )
+            .order_by(progress.due_at)
+            .limit(limit - len(cards))
+        )
+        cards.extend(result.scalars().all())
+    
+    return cards
 
 # Статистика
 async def get_user_progress_stats(db: AsyncSession, user_id: int) -> dict:
-    """Получить статистику прогресса пользователя"""
-    total_cards_query = select(func.count(models.Card.id))
-    total_cards_result = await db.execute(total_cards_query)
-    total_cards = total_cards_result.scalar() or 0
+    """Получить статистику прогресса пользователя
     
+    Читает сводки user_stats и counters по первичному ключу; агрегаты
+    по таблицам считаются только если сводка ещё не создана.
+    """
+    total_cards = (await db.execute(
+        select(models.Counter.value).where(models.Counter.name == CARDS_COUNTER)
+    )).scalar_one_or_none()
+    if total_cards is None:
+        total_cards_query = select(func.count(models.Card.id))
+        total_cards_result = await db.execute(total_cards_query)
+        total_cards = total_cards_result.scalar() or 0
     
-    total_reviews_query = select(func.sum(models.UserCardProgress.total_attempts)).where(
-        models.UserCardProgress.user_id == user_id
+    stats_result = await db.execute(
+        select(models.UserStats).where(models.UserStats.user_id == user_id)
     )
-    total_reviews_result = await db.execute(total_reviews_query)
-    total_reviews = total_reviews_result.scalar() or 0
+    user_stats = stats_result.scalar_one_or_none()
     
-    total_correct_query = select(func.sum(models.UserCardProgress.correct_answers)).where(
-        models.UserCardProgress.user_id == user_id
-    )
-    total_correct_result = await db.execute(total_correct_query)
-    total_correct = total_correct_result.scalar() or 0
+    if user_stats:
+        total_reviews = user_stats.total_reviews
+        total_correct = user_stats.total_correct
+    else:
+        total_reviews_query = select(func.sum(models.UserCardProgress.total_attempts)).where(
+            models.UserCardProgress.user_id == user_id
+        )
+        total_reviews_result = await db.execute(total_reviews_query)
+        total_reviews = total_reviews_result.scalar() or 0
+        
+        total_correct_query = select(func.sum(models.UserCardProgress.correct_answers)).where(
+            models.UserCardProgress.user_id == user_id
+        )
+        total_correct_result = await db.execute(total_correct_query)
+        total_correct = total_correct_result.scalar() or 0
     
     average_score = 0
     if total_reviews > 0:
@@ -244,5 +1149,6 @@ async def get_user_progress_stats(db: AsyncSession, user_id: int) -> dict:
     return {
         "total_cards": total_cards,
         "total_reviews": total_reviews,
+        "total_correct": total_correct,
         "average_score": round(average_score, 2),
     }
\ No newline at end of file
@@ -1,38 +1,114 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import declarative_base
+from sqlalchemy import event
+from typing import Optional
 import os
 from dotenv import load_dotenv
 
+from app.cache import TTLCache
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./database.db")
 
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_async_engine(
-        DATABASE_URL,
-        echo=True,
-        future=True,
-        poolclass=NullPool,
-        connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_async_engine(
-        DATABASE_URL,
-        echo=True,
+# "default" — прежнее поведение (NullPool), "production" — пул соединений,
+# WAL и настроенные PRAGMA
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+SQL_ECHO = os.getenv(
+    "SQL_ECHO", "false" if SQLITE_PROFILE == "production" else "true"
+).lower() in ("1", "true", "yes")
+
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "5"))
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "10"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite проверяет внешние ключи (и ON DELETE CASCADE) только по PRAGMA
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def _create_engine(url: str):
+    if url.startswith("sqlite") and SQLITE_PROFILE == "production":
+        db_engine = create_async_engine(
+            url,
+            echo=SQL_ECHO,
+            future=True,
+            pool_size=SQLITE_POOL_SIZE,
+            max_overflow=SQLITE_MAX_OVERFLOW,
+            connect_args={"check_same_thread": False}
+        )
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        event.listen(db_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+        return db_engine
+    
+    if url.startswith("sqlite"):
+        db_engine = create_async_engine(
+            url,
+            echo=SQL_ECHO,
+            future=True,
+            poolclass=NullPool,
+            connect_args={"check_same_thread": False}
+        )
+        event.listen(db_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+        return db_engine
+    
+    return create_async_engine(
+        url,
+        echo=SQL_ECHO,
         future=True,
         pool_size=20,
         max_overflow=30,
         pool_pre_ping=True,
     )
 
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
-)
+def _create_sessionmaker(db_engine):
+    return async_sessionmaker(
+        db_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+engine = _create_engine(DATABASE_URL)
+AsyncSessionLocal = _create_sessionmaker(engine)
+
+# Реплика для чтения; без READ_DATABASE_URL чтение идёт в основную БД
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+READ_AFTER_WRITE_SECONDS = float(os.getenv("READ_AFTER_WRITE_SECONDS", "5"))
+
+if READ_DATABASE_URL:
+    read_engine = _create_engine(READ_DATABASE_URL)
+    ReadSessionLocal = _create_sessionmaker(read_engine)
+else:
+    read_engine = engine
+    ReadSessionLocal = AsyncSessionLocal
+
+# Пользователи, недавно писавшие в основную БД: их чтения идут туда же,
+# чтобы они сразу видели свои изменения несмотря на отставание реплики
+_recent_writers = TTLCache(maxsize=100000, ttl=READ_AFTER_WRITE_SECONDS)
+
+def mark_user_write(user_id: int):
+    _recent_writers.set(user_id, True)
+
+def read_sessionmaker_for(user_id: Optional[int] = None):
+    if user_id is not None and _recent_writers.get(user_id):
+        return AsyncSessionLocal
+    return ReadSessionLocal
 
 Base = declarative_base()
 
@@ -46,13 +122,16 @@ async def get_db() -> AsyncSession:
 async def init_db():
     """Создание таблиц и администратора"""
     from sqlalchemy import select
-    from app import models
-    from app.auth import get_password_hash
+    from app import migrations, models
+    from app.auth import aget_password_hash
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        applied = await conn.run_sync(migrations.upgrade)
     
     print("✅ Database tables created")
+    if applied:
+        print(f"✅ Migrations applied: {applied}")
     
     # создание администратора
     async with AsyncSessionLocal() as session:
@@ -66,7 +145,7 @@ async def init_db():
             admin_user = models.User(
                 username="admin",
                 email="admin@example.com",
-                hashed_password=get_password_hash(admin_password),
+                hashed_password=await aget_password_hash(admin_password),
                 role="admin",
                 is_active=True
             )
@@ -76,4 +155,6 @@ async def init_db():
 
 async def close_db():
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
     print("✅ Database connections closed")
\ No newline at end of file
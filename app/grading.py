@@ -0,0 +1,142 @@
+"""Проверка ответов на тесты по индексу допустимых переводов
+
+Для каждой карточки в памяти хранится frozenset нормализованных ответов:
+перевод целиком и каждое значение из перечисления через , ; /
+("house, home" -> {"house, home", "house", "home"}); запятая между
+цифрами перечисление не разделяет ("1,000"). Нормализация —
+NFKD без диакритики у латинских букв, casefold и схлопывание пробелов,
+так что "Café" и "cafe" совпадают, а "й" и "и", "ё" и "е" различаются.
+Индекс строится при старте и обновляется записями карточек через crud;
+недостающие карточки догружаются одним запросом.
+
+GRADING_MAX_EDITS > 0 включает нечёткое сравнение: ответ засчитывается,
+если расстояние Левенштейна до одного из вариантов не больше k. Оно
+применяется только к вариантам не короче GRADING_FUZZY_MIN_LENGTH символов.
+
+Индекс у каждого воркера свой, поэтому записи живут
+GRADING_INDEX_TTL_SECONDS: правка перевода в другом процессе видна
+не позже, чем через это время. Удаление карточки в другом процессе
+обнаруживает crud.apply_progress_outcomes и убирает её из индекса.
+"""
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable
+import os
+import re
+import unicodedata
+from dotenv import load_dotenv
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.cache import TTLCache
+
+load_dotenv()
+
+GRADING_MAX_EDITS = int(os.getenv("GRADING_MAX_EDITS", "0"))
+GRADING_FUZZY_MIN_LENGTH = int(os.getenv("GRADING_FUZZY_MIN_LENGTH", "5"))
+GRADING_PRELOAD = os.getenv("GRADING_PRELOAD", "true").lower() in ("1", "true", "yes")
+GRADING_INDEX_TTL_SECONDS = float(os.getenv("GRADING_INDEX_TTL_SECONDS", "300"))
+GRADING_INDEX_MAX_SIZE = int(os.getenv("GRADING_INDEX_MAX_SIZE", "1000000"))
+
+# Запятая между цифрами — часть числа ("1,000"), а не перечисление
+ANSWER_SEPARATORS = re.compile(r"[;/]|,(?!\d)|(?<!\d),")
+WHITESPACE = re.compile(r"\s+")
+
+_index = TTLCache(maxsize=GRADING_INDEX_MAX_SIZE, ttl=GRADING_INDEX_TTL_SECONDS)
+
+@lru_cache(maxsize=4096)
+def _is_latin(char: str) -> bool:
+    return unicodedata.name(char, "").startswith("LATIN")
+
+def normalize(text: str) -> str:
+    # Диакритика снимается только с латиницы: "й" и "ё" — отдельные буквы,
+    # и после обратной сборки (NFC) они остаются собой
+    chars = []
+    for char in unicodedata.normalize("NFKD", text):
+        if unicodedata.combining(char) and chars and _is_latin(chars[-1]):
+            continue
+        chars.append(char)
+    folded = unicodedata.normalize("NFC", "".join(chars)).casefold()
+    return WHITESPACE.sub(" ", folded).strip()
+
+def accepted_answers(translation: str) -> FrozenSet[str]:
+    answers = {normalize(translation)}
+    answers.update(normalize(part) for part in ANSWER_SEPARATORS.split(translation))
+    answers.discard("")
+    return frozenset(answers)
+
+def set_answers(card_id: int, translation: str):
+    _index.set(card_id, accepted_answers(translation))
+
+def discard(card_ids: Iterable[int]):
+    for card_id in card_ids:
+        _index.pop(card_id)
+
+def clear():
+    _index.clear()
+
+def size() -> int:
+    return len(_index)
+
+async def build(db: AsyncSession) -> int:
+    """Построить индекс по всем карточкам; вернуть их число"""
+    clear()
+    loaded = 0
+    query = select(models.Card.id, models.Card.translation)
+    result = await db.stream(query.execution_options(yield_per=10000))
+    async for card_id, translation in result:
+        set_answers(card_id, translation)
+        loaded += 1
+    return loaded
+
+async def get_answers(db: AsyncSession, card_ids: Iterable[int]) -> Dict[int, FrozenSet[str]]:
+    """Допустимые ответы по карточкам; несуществующие карточки отсутствуют"""
+    answers = {}
+    missing = []
+    for card_id in set(card_ids):
+        accepted = _index.get(card_id)
+        if accepted is None:
+            missing.append(card_id)
+        else:
+            answers[card_id] = accepted
+    
+    if missing:
+        result = await db.execute(
+            select(models.Card.id, models.Card.translation).where(models.Card.id.in_(missing))
+        )
+        for card_id, translation in result:
+            answers[card_id] = accepted_answers(translation)
+            _index.set(card_id, answers[card_id])
+    return answers
+
+def _within_edits(a: str, b: str, k: int) -> bool:
+    """Расстояние Левенштейна между a и b не больше k (полоса шириной 2k+1)"""
+    if abs(len(a) - len(b)) > k:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        low, high = max(1, i - k), min(len(b), i + k)
+        current = [k + 1] * (len(b) + 1)
+        current[0] = i if i <= k else k + 1
+        for j in range(low, high + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        if min(current[low - 1:high + 1]) > k:
+            return False
+        previous = current
+    return previous[len(b)] <= k
+
+def is_correct(user_answer: str, accepted: FrozenSet[str]) -> bool:
+    answer = normalize(user_answer)
+    if answer in accepted:
+        return True
+    if GRADING_MAX_EDITS <= 0 or not answer:
+        return False
+    return any(
+        len(option) >= GRADING_FUZZY_MIN_LENGTH and _within_edits(answer, option, GRADING_MAX_EDITS)
+        for option in accepted
+    )
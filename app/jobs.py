@@ -0,0 +1,281 @@
+"""Фоновые задачи администратора
+
+Долгие операции (массовое удаление карточек, пересчёт статистики,
+перестройка индексов) ставятся в очередь и сразу возвращают id задачи;
+статус и прогресс читаются через GET /jobs/{id}. Задачи хранятся в таблице
+jobs, а выполняют их JOB_WORKERS фоновых обработчиков, запущенных в
+main.lifespan.
+
+Задача забирается условным UPDATE queued -> running с записью владельца
+(WORKER_ID), так что при нескольких воркерах uvicorn её выполняет один
+процесс. Владелец обновляет heartbeat_at каждые JOB_HEARTBEAT_SECONDS;
+задачу, чей heartbeat старше JOB_LEASE_SECONDS (владелец упал или
+перезапущен), любой воркер возвращает в очередь. Такая задача может
+выполниться повторно, поэтому обработчики идемпотентны.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import os
+import socket
+import uuid
+from dotenv import load_dotenv
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, grading, models
+from app.database import AsyncSessionLocal
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Удаление карточек идёт пачками; прогресс задачи обновляется после каждой
+DELETE_BATCH_SIZE = 1000
+
+# Уникален для процесса: pid может повториться после перезапуска контейнера
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+class JobContext:
+    """Передаётся обработчику: параметры задачи и отчёт о прогрессе"""
+
+    def __init__(self, job_id: int, params: Optional[dict], user_id: Optional[int] = None):
+        self.job_id = job_id
+        self.params = params or {}
+        self.user_id = user_id
+
+    async def report(self, progress: int, total: Optional[int] = None):
+        # Отдельная сессия: прогресс виден, пока транзакция обработчика открыта
+        values: Dict[str, Any] = {"progress": progress}
+        if total is not None:
+            values["total"] = total
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(models.Job).where(models.Job.id == self.job_id).values(**values)
+            )
+            await session.commit()
+
+Handler = Callable[[AsyncSession, JobContext], Awaitable[Optional[dict]]]
+HANDLERS: Dict[str, Handler] = {}
+
+def handler(kind: str):
+    def register(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+    return register
+
+_queue: Optional[asyncio.Queue] = None
+_enqueued: Set[int] = set()
+_workers: List[asyncio.Task] = []
+
+def _enqueue(job_id: int):
+    if _queue is not None and job_id not in _enqueued:
+        _enqueued.add(job_id)
+        _queue.put_nowait(job_id)
+
+async def submit(db: AsyncSession, kind: str, params: Optional[dict], user_id: Optional[int]) -> models.Job:
+    """Сохранить задачу и поставить её в очередь"""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job = models.Job(kind=kind, status=QUEUED, params=params, created_by=user_id)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    _enqueue(job.id)
+    return job
+
+async def get_job(db: AsyncSession, job_id: int) -> Optional[models.Job]:
+    result = await db.execute(select(models.Job).where(models.Job.id == job_id))
+    return result.scalar_one_or_none()
+
+async def _finish(job_id: int, **values):
+    async with AsyncSessionLocal() as session:
+        # Если аренда истекла и задачу забрал другой воркер, итог пишет он
+        await session.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.owner == WORKER_ID)
+            .values(finished_at=datetime.utcnow(), **values)
+        )
+        await session.commit()
+
+async def _heartbeat(job_id: int):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(models.Job)
+                    .where(
+                        models.Job.id == job_id,
+                        models.Job.owner == WORKER_ID,
+                        models.Job.status == RUNNING,
+                    )
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                await session.commit()
+        except Exception as e:
+            print(f"⚠️ Job {job_id} heartbeat failed: {e}")
+
+async def _run_job(job_id: int):
+    async with AsyncSessionLocal() as session:
+        now = datetime.utcnow()
+        claimed = await session.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == QUEUED)
+            .values(status=RUNNING, started_at=now, owner=WORKER_ID, heartbeat_at=now)
+        )
+        await session.commit()
+        if claimed.rowcount == 0:
+            return
+
+        job = await get_job(session, job_id)
+        context = JobContext(job.id, job.params, job.created_by)
+        run = HANDLERS.get(job.kind)
+        heartbeat = asyncio.create_task(_heartbeat(job_id))
+
+        try:
+            if run is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            result = await run(session, context)
+        except Exception as e:
+            await session.rollback()
+            print(f"❌ Job {job_id} ({job.kind}) failed: {e}")
+            await _finish(job_id, status=FAILED, error=str(e))
+            return
+        finally:
+            heartbeat.cancel()
+
+    await _finish(job_id, status=SUCCEEDED, result=result)
+
+async def _worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_job(job_id)
+        except Exception as e:
+            print(f"❌ Job {job_id} could not be run: {e}")
+        finally:
+            _enqueued.discard(job_id)
+            _queue.task_done()
+
+async def recover() -> int:
+    """Вернуть в очередь задачи упавших воркеров и взять все ожидающие
+    
+    Задача running с heartbeat старше JOB_LEASE_SECONDS осталась без
+    владельца. Ожидающие задачи могли сидеть в памяти такого воркера,
+    поэтому они ставятся и в эту очередь: выполнит их тот, кто заберёт первым.
+    """
+    expired = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    async with AsyncSessionLocal() as session:
+        requeued = await session.execute(
+            update(models.Job)
+            .where(
+                models.Job.status == RUNNING,
+                or_(models.Job.heartbeat_at.is_(None), models.Job.heartbeat_at < expired),
+            )
+            .values(status=QUEUED, owner=None)
+        )
+        await session.commit()
+        pending = (await session.execute(
+            select(models.Job.id).where(models.Job.status == QUEUED).order_by(models.Job.id)
+        )).scalars().all()
+
+    for job_id in pending:
+        _enqueue(job_id)
+    return requeued.rowcount
+
+async def _recovery_loop():
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS)
+        try:
+            requeued = await recover()
+            if requeued:
+                print(f"✅ {requeued} abandoned jobs requeued")
+        except Exception as e:
+            print(f"❌ Job recovery failed: {e}")
+
+async def start():
+    """Запустить обработчики и взять задачи, оставшиеся без владельца"""
+    global _queue
+    if _queue is not None:
+        return
+
+    _queue = asyncio.Queue()
+    requeued = await recover()
+    for _ in range(JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+    _workers.append(asyncio.create_task(_recovery_loop()))
+
+    if _enqueued:
+        print(f"✅ Job runner started, {len(_enqueued)} jobs pending, {requeued} requeued")
+
+async def stop():
+    """Остановить обработчики и вернуть свои незавершённые задачи в очередь"""
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _enqueued.clear()
+    _queue = None
+
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(models.Job)
+            .where(models.Job.owner == WORKER_ID, models.Job.status == RUNNING)
+            .values(status=QUEUED, owner=None)
+        )
+        await session.commit()
+
+# Обработчики
+
+@handler("delete_cards")
+async def delete_cards_job(db: AsyncSession, context: JobContext) -> dict:
+    card_ids = context.params.get("card_ids")
+    if card_ids is None:
+        card_ids = await crud.get_card_ids(
+            db,
+            language=context.params.get("language"),
+            difficulty_level=context.params.get("difficulty_level"),
+        )
+        # Закрываем читающую транзакцию: в SQLite её нельзя продолжить
+        # записью после того, как report() запишет прогресс
+        await db.commit()
+    card_ids = list(dict.fromkeys(card_ids))
+    await context.report(0, total=len(card_ids))
+
+    # Каждая пачка — отдельная транзакция, чтобы прогресс был виден
+    deleted = 0
+    for start in range(0, len(card_ids), DELETE_BATCH_SIZE):
+        deleted += len(await crud.delete_cards(
+            db, card_ids=card_ids[start:start + DELETE_BATCH_SIZE], admin_id=context.user_id
+        ))
+        await context.report(min(start + DELETE_BATCH_SIZE, len(card_ids)))
+
+    return {"deleted": deleted, "missing": len(card_ids) - deleted}
+
+@handler("rebuild_stats")
+async def rebuild_stats_job(db: AsyncSession, context: JobContext) -> dict:
+    await context.report(0, total=1)
+    result = await crud.rebuild_progress_rollups(db)
+    await context.report(1)
+    return result
+
+@handler("reindex_cards")
+async def reindex_cards_job(db: AsyncSession, context: JobContext) -> dict:
+    await context.report(0, total=2)
+    await crud.rebuild_card_search_index(db)
+    await context.report(1)
+    # Индекс проверки ответов перестраивается только в этом процессе
+    cards = await grading.build(db)
+    await context.report(2)
+    return {"cards": cards}
@@ -1,24 +1,44 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from app.database import init_db, close_db
-from app.routers import auth, cards, progress
+import os
+from app.database import AsyncSessionLocal, init_db, close_db, engine, read_engine
+from app.routers import auth, cards, jobs as jobs_router, progress
+from app.auth import shutdown_password_hasher
+from app import grading, jobs, metrics, writebehind
+from app.middleware import (
+    CACHE_CONTROL_CATALOG, CACHE_CONTROL_PRIVATE, CacheControlMiddleware, add_compression,
+)
 import uvicorn
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 Starting Foreign Words API...")
     
-    try:
-        await init_db()
-        print("✅ Database initialized")
-    except Exception as e:
-        print(f"❌ Database initialization failed: {e}")
-        raise
+    # app.server уже подготовил БД в родительском процессе
+    if os.getenv("SKIP_INIT_DB") != "1":
+        try:
+            await init_db()
+            print("✅ Database initialized")
+        except Exception as e:
+            print(f"❌ Database initialization failed: {e}")
+            raise
+    
+    if grading.GRADING_PRELOAD:
+        async with AsyncSessionLocal() as session:
+            loaded = await grading.build(session)
+        print(f"✅ Grading index built: {loaded} cards")
+    
+    await writebehind.start()
+    await jobs.start()
     
     yield
     
     print("🛑 Shutting down...")
+    await jobs.stop()
+    await writebehind.stop()
+    await shutdown_password_hasher()
     await close_db()
     print("✅ Database connections closed")
 
@@ -35,11 +55,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Курсор следующей страницы и ETag каталога читаются браузерными клиентами
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+add_compression(app)
+app.add_middleware(
+    CacheControlMiddleware,
+    policies=[
+        ("/cards/", CACHE_CONTROL_CATALOG),
+        ("/progress/", CACHE_CONTROL_PRIVATE),
+        ("/auth/", "no-store"),
+        ("/jobs/", "no-store"),
+        ("/metrics", "no-store"),
+    ],
+    default="no-cache",
 )
 
+# Число SQL-запросов и время в БД на каждый HTTP-запрос
+metrics.instrument_engine(engine)
+metrics.instrument_engine(read_engine)
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(auth.router, prefix="/auth", tags=["Аутентификация"])
 app.include_router(cards.router, prefix="/cards", tags=["Карточки"])
 app.include_router(progress.router, prefix="/progress", tags=["Прогресс"])
+app.include_router(jobs_router.router, prefix="/jobs", tags=["Задачи"])
 
 @app.get("/")
 async def root():
@@ -49,5 +90,12 @@ async def root():
         "admin": "Login as 'admin' to manage cards"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    """Метрики в формате Prometheus"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""Метрики запросов: число SQL-запросов, время в БД, латентность по маршрутам
+
+Счётчики SQL собираются через события движков SQLAlchemy и привязываются
+к текущему HTTP-запросу через contextvars. Ответ получает заголовок
+Server-Timing, а /metrics отдаёт гистограммы в формате Prometheus.
+Метрики хранятся в памяти процесса, у каждого воркера свои.
+"""
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+from sqlalchemy import event
+
+load_dotenv()
+
+logger = logging.getLogger("app.sql")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+class RequestStats:
+    __slots__ = ("query_count", "db_time", "slowest_time", "slowest_statement")
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_db_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.total += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+# (method, route) -> гистограммы
+_request_duration: Dict[Tuple[str, str], Histogram] = {}
+_request_db_time: Dict[Tuple[str, str], Histogram] = {}
+_request_queries: Dict[Tuple[str, str], Histogram] = {}
+_slow_queries = 0
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    global _slow_queries
+    started = conn.info["query_start_time"].pop()
+    elapsed = time.perf_counter() - started
+
+    stats = _current.get()
+    if stats is not None:
+        stats.query_count += 1
+        stats.db_time += elapsed
+        if elapsed > stats.slowest_time:
+            stats.slowest_time = elapsed
+            stats.slowest_statement = statement
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        _slow_queries += 1
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split()))
+
+def _handle_error(exception_context):
+    # Сбрасываем отметку времени, если запрос упал до after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+def _observe(store: Dict[Tuple[str, str], Histogram], key: Tuple[str, str], buckets, value: float):
+    histogram = store.get(key)
+    if histogram is None:
+        histogram = store[key] = Histogram(buckets)
+    histogram.observe(value)
+
+def _server_timing(stats: RequestStats, elapsed: float) -> str:
+    parts = [
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.query_count} queries"',
+        f"app;dur={elapsed * 1000:.2f}",
+    ]
+    if stats.slowest_statement is not None:
+        parts.append(f"db-slowest;dur={stats.slowest_time * 1000:.2f}")
+    return ", ".join(parts)
+
+class MetricsMiddleware:
+    """ASGI-middleware: считает SQL-запросы и время запроса, пишет Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    _server_timing(stats, time.perf_counter() - started).encode("latin-1"),
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            key = (scope["method"], getattr(route, "path", "unmatched"))
+            _observe(_request_duration, key, DURATION_BUCKETS, time.perf_counter() - started)
+            _observe(_request_db_time, key, DURATION_BUCKETS, stats.db_time)
+            _observe(_request_queries, key, QUERY_COUNT_BUCKETS, stats.query_count)
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+def _render_histograms(lines: List[str], name: str, help_text: str, store):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in sorted(store.items()):
+        labels = {"method": method, "route": route}
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {histogram.total}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.total}")
+
+def render() -> str:
+    """Метрики в текстовом формате Prometheus"""
+    from app.auth import get_auth_cache_stats
+
+    lines: List[str] = []
+    _render_histograms(lines, "http_request_duration_seconds", "HTTP request latency", _request_duration)
+    _render_histograms(lines, "http_request_db_seconds", "Time spent in the database per request", _request_db_time)
+    _render_histograms(lines, "http_request_db_queries", "SQL statements per request", _request_queries)
+
+    lines.append("# HELP db_slow_queries_total Statements slower than SLOW_QUERY_MS")
+    lines.append("# TYPE db_slow_queries_total counter")
+    lines.append(f"db_slow_queries_total {_slow_queries}")
+
+    auth_cache = get_auth_cache_stats()
+    lines.append("# HELP auth_cache_db_round_trips_saved_total User lookups served from the auth cache")
+    lines.append("# TYPE auth_cache_db_round_trips_saved_total counter")
+    lines.append(f"auth_cache_db_round_trips_saved_total {auth_cache['db_round_trips_saved']}")
+
+    return "\n".join(lines) + "\n"
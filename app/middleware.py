@@ -0,0 +1,86 @@
+"""HTTP-middleware: сжатие ответов и заголовки Cache-Control по маршрутам"""
+from typing import Sequence, Tuple
+import os
+from dotenv import load_dotenv
+
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+load_dotenv()
+
+# gzip | brotli | off; brotli требует пакет brotli-asgi, иначе используется gzip
+COMPRESSION = os.getenv("COMPRESSION", "brotli").lower()
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1000"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Каталог можно хранить в кэше браузера, но с проверкой ETag при каждом
+# запросе (в ответе есть прогресс пользователя); прогресс не кэшируется
+CACHE_CONTROL_CATALOG = os.getenv("CACHE_CONTROL_CATALOG", "private, no-cache")
+CACHE_CONTROL_PRIVATE = os.getenv("CACHE_CONTROL_PRIVATE", "private, no-store")
+
+CACHEABLE_METHODS = ("GET", "HEAD")
+CACHEABLE_STATUSES = (200, 304)
+
+def add_compression(app):
+    """Подключить сжатие ответов согласно COMPRESSION"""
+    if COMPRESSION == "off":
+        return None
+
+    if COMPRESSION == "brotli" and BrotliMiddleware is not None:
+        app.add_middleware(
+            BrotliMiddleware,
+            quality=BROTLI_QUALITY,
+            minimum_size=COMPRESSION_MIN_SIZE,
+            gzip_fallback=True,
+        )
+        return "brotli"
+
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=GZIP_LEVEL)
+    return "gzip"
+
+class CacheControlMiddleware:
+    """Cache-Control по префиксу пути для ответов на GET/HEAD
+
+    policies — пары (префикс, значение заголовка), первое совпадение побеждает.
+    Ответы, которые уже задали Cache-Control сами, не трогаются;
+    ответы на остальные методы получают no-store.
+    """
+
+    def __init__(self, app, policies: Sequence[Tuple[str, str]], default: str = "no-store"):
+        self.app = app
+        self.policies = list(policies)
+        self.default = default
+
+    def _policy_for(self, path: str) -> str:
+        for prefix, policy in self.policies:
+            if path == prefix.rstrip("/") or path.startswith(prefix):
+                return policy
+        return self.default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in CACHEABLE_METHODS:
+            policy = self._policy_for(scope["path"])
+        else:
+            policy = "no-store"
+
+        async def send_with_policy(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "cache-control" not in headers:
+                    if message["status"] in CACHEABLE_STATUSES:
+                        headers["Cache-Control"] = policy
+                    else:
+                        headers["Cache-Control"] = "no-store"
+            await send(message)
+
+        await self.app(scope, receive, send_with_policy)
@@ -0,0 +1,265 @@
+"""Версионированные миграции схемы
+
+    python -m app.migrations upgrade       # применить недостающие миграции
+    python -m app.migrations status        # показать применённые версии
+    python -m app.migrations check-plans   # EXPLAIN горячих запросов crud (SQLite)
+
+Новая БД создаётся через Base.metadata.create_all, после чего миграции
+только отмечаются как применённые: каждая из них идемпотентна и добавляет
+столбцы и индексы лишь тогда, когда их нет.
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+import argparse
+import asyncio
+import re
+import sys
+
+from sqlalchemy import event, func, inspect, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+def _column_ddl(conn: Connection, column) -> str:
+    ddl = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+    default = column.server_default
+    # SQLite не допускает ADD COLUMN с DEFAULT CURRENT_TIMESTAMP,
+    # поэтому переносятся только константные значения по умолчанию
+    if default is not None and isinstance(default.arg, str):
+        ddl += f" DEFAULT {default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+def _add_missing_columns(conn: Connection, table, names: List[str]):
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(conn, table.c[name])}"))
+
+def _create_missing_indexes(conn: Connection, table):
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+def _0001_progress_schedule(conn: Connection):
+    table = models.UserCardProgress.__table__
+    _add_missing_columns(conn, table, ["due_at", "interval_days", "ease", "streak"])
+    conn.execute(update(table).where(table.c.due_at.is_(None)).values(due_at=func.now()))
+
+def _0002_hot_path_indexes(conn: Connection):
+    for model in (models.Card, models.UserCardProgress):
+        _create_missing_indexes(conn, model.__table__)
+
+def _0003_card_search(conn: Connection):
+    fts = models.CARDS_FTS_TABLE
+    if conn.dialect.name == "sqlite":
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": fts},
+        ).scalar()
+        if exists:
+            return
+        try:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                "foreign_word, translation, example_sentence, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            ))
+        except OperationalError as e:
+            print(f"⚠️ FTS5 is not available, card search falls back to LIKE: {e}")
+            return
+        conn.execute(text(
+            f"INSERT INTO {fts} (rowid, foreign_word, translation, example_sentence) "
+            "SELECT id, foreign_word, translation, coalesce(example_sentence, '') FROM cards"
+        ))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_cards_search_document ON cards "
+            f"USING gin (({models.CARD_SEARCH_DOCUMENT_SQL}))"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_cards_foreign_word_trgm ON cards "
+            "USING gin (foreign_word gin_trgm_ops)"
+        ))
+
+def _0004_progress_card_cascade(conn: Connection):
+    # SQLite не меняет ограничения существующих таблиц: там прогресс
+    # удаляется явно в crud.delete_cards, а CASCADE есть у новых БД
+    if conn.dialect.name != "postgresql":
+        return
+    table = models.UserCardProgress.__tablename__
+    for foreign_key in inspect(conn).get_foreign_keys(table):
+        if foreign_key["referred_table"] != "cards":
+            continue
+        if (foreign_key.get("options") or {}).get("ondelete", "").upper() == "CASCADE":
+            continue
+        conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{foreign_key["name"]}"'))
+        conn.execute(text(
+            f'ALTER TABLE {table} ADD CONSTRAINT "{foreign_key["name"]}" '
+            "FOREIGN KEY (card_id) REFERENCES cards (id) ON DELETE CASCADE"
+        ))
+
+def _0005_job_leases(conn: Connection):
+    _add_missing_columns(conn, models.Job.__table__, ["owner", "heartbeat_at"])
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "user_card_progress review schedule columns", _0001_progress_schedule),
+    (2, "indexes for crud hot paths", _0002_hot_path_indexes),
+    (3, "full-text card search", _0003_card_search),
+    (4, "cascade progress deletion with cards", _0004_progress_card_cascade),
+    (5, "job owner and heartbeat", _0005_job_leases),
+]
+
+def _ensure_migrations_table(conn: Connection):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+
+def applied_versions(conn: Connection) -> List[int]:
+    _ensure_migrations_table(conn)
+    result = conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE} ORDER BY version"))
+    return [row[0] for row in result]
+
+def upgrade(conn: Connection) -> List[int]:
+    """Применить недостающие миграции; вернуть их версии"""
+    applied = set(applied_versions(conn))
+    done = []
+
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate(conn)
+        conn.execute(
+            text(f"INSERT INTO {MIGRATIONS_TABLE} (version, description) VALUES (:version, :description)"),
+            {"version": version, "description": description},
+        )
+        done.append(version)
+
+    return done
+
+# Проверка планов запросов. Полный проход — любая строка «SCAN t», в том
+# числе «SCAN t USING [COVERING] INDEX ...» (обход всего индекса).
+# Намеренные проходы перечислены явно: страница по skip/limit обходит
+# индекс до OFFSET, а выборка с весами читает вес каждой карточки.
+ALLOWED_SCANS = {
+    "get_all_cards_offset": {"cards"},
+    "get_random_cards_for_user": {"cards"},
+}
+FULL_SCAN = re.compile(r"^SCAN (\S+)")
+# Не таблицы: списки VALUES, подзапросы и FTS5 (ищет по своему индексу)
+NOT_A_TABLE_SCAN = re.compile(r"^SCAN (\d+ CONSTANT ROW|\(|.* VIRTUAL TABLE)")
+PLANNED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+def _hot_queries():
+    from app import crud
+
+    return [
+        ("get_user_by_username", lambda db: crud.get_user_by_username(db, "admin")),
+        ("get_card", lambda db: crud.get_card(db, 1)),
+        ("get_all_cards_offset", lambda db: crud.get_all_cards(db, skip=0, limit=100)),
+        ("get_all_cards_cursor", lambda db: crud.get_all_cards(db, limit=100, cursor=(datetime.utcnow(), 1))),
+        ("get_user_progress_for_card", lambda db: crud.get_user_progress_for_card(db, 1, 1)),
+        ("get_user_progress_for_cards", lambda db: crud.get_user_progress_for_cards(db, 1, [1, 2, 3])),
+        ("get_random_cards_for_user", lambda db: crud.get_random_cards_for_user(db, 1, 10)),
+        ("get_due_cards_for_user", lambda db: crud.get_due_cards_for_user(db, 1, 10)),
+        ("get_user_progress_stats", lambda db: crud.get_user_progress_stats(db, 1)),
+        ("search_cards", lambda db: crud.search_cards(db, query="house", language="english")),
+        ("search_cards", lambda db: crud.search_cards(db, prefix="ho")),
+        # Чтения на пути записи; всё откатывается вместе с проверкой
+        ("_get_review_states", lambda db: crud._get_review_states(db, [(1, 1), (1, 2), (2, 3)])),
+        ("apply_progress_outcomes", lambda db: crud.apply_progress_outcomes(db, {(1, 1): [True], (1, 2): [False]})),
+        ("delete_cards", lambda db: crud.delete_cards(db, card_ids=[1, 2])),
+    ]
+
+async def check_query_plans() -> List[str]:
+    """EXPLAIN QUERY PLAN для запросов crud; вернуть найденные полные проходы"""
+    from app.database import engine
+
+    if engine.dialect.name != "sqlite":
+        print(f"⚠️ Query plan check supports SQLite only, got {engine.dialect.name}")
+        return []
+
+    captured = []
+    current = {"label": None}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if current["label"] and statement.lstrip().upper().startswith(PLANNED_STATEMENTS):
+            captured.append((current["label"], statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with engine.connect() as connection:
+            # Часть запросов пишет (выдача новых карточек): всё выполняется
+            # во внешней транзакции, а commit сессии лишь снимает SAVEPOINT.
+            # pysqlite сам не открывает транзакцию, поэтому BEGIN явный:
+            # иначе первый SAVEPOINT стал бы внешним и RELEASE записал бы данные
+            await connection.begin()
+            await connection.exec_driver_sql("BEGIN")
+            session = AsyncSession(
+                bind=connection,
+                join_transaction_mode="create_savepoint",
+                expire_on_commit=False,
+            )
+            for label, call in _hot_queries():
+                current["label"] = label
+                await call(session)
+            current["label"] = None
+
+            problems = []
+            for label, statement, parameters in captured:
+                plan = await connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+                for row in plan:
+                    match = FULL_SCAN.match(row[-1])
+                    if (
+                        match
+                        and not NOT_A_TABLE_SCAN.match(row[-1])
+                        and not match.group(1).startswith("sqlite_")
+                        and match.group(1) not in ALLOWED_SCANS.get(label, set())
+                    ):
+                        problems.append(f"{label}: {row[-1]}\n    {' '.join(statement.split())}")
+            await session.close()
+            await connection.rollback()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    return problems
+
+async def main(command: str) -> int:
+    from app.database import Base, close_db, engine
+
+    try:
+        if command == "upgrade":
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                done = await conn.run_sync(upgrade)
+            print(f"✅ Applied migrations: {done or 'none'}")
+        elif command == "status":
+            async with engine.begin() as conn:
+                applied = await conn.run_sync(applied_versions)
+            for version, description, _ in MIGRATIONS:
+                mark = "✅" if version in applied else "⏳"
+                print(f"{mark} {version:04d} {description}")
+        else:
+            problems = await check_query_plans()
+            for problem in problems:
+                print(f"❌ {problem}")
+            if problems:
+                return 1
+            print("✅ No unexpected full table scans")
+        return 0
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schema migrations")
+    parser.add_argument("command", choices=["upgrade", "status", "check-plans"])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.command)))
@@ -1,8 +1,23 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Boolean, UniqueConstraint, Index, JSON
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
+# Формат CURRENT_TIMESTAMP в SQLite (без микросекунд): параметры сравнения
+# совпадают со значениями server_default, что нужно для keyset-пагинации
+SQLITE_TIMESTAMP = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+)
+
+# Полнотекстовый поиск по карточкам: FTS5-таблица в SQLite и
+# выражение для GIN-индекса в PostgreSQL (см. app/migrations.py)
+CARDS_FTS_TABLE = "cards_fts"
+CARD_SEARCH_DOCUMENT_SQL = (
+    "to_tsvector('simple', coalesce(foreign_word, '') || ' ' || "
+    "coalesce(translation, '') || ' ' || coalesce(example_sentence, ''))"
+)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -24,8 +39,17 @@ class Card(Base):
     language = Column(String, default="english")
     difficulty_level = Column(Integer, default=1)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True).with_variant(SQLITE_TIMESTAMP, "sqlite"),
+        server_default=func.now()
+    )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_cards_created_at_id", "created_at", "id"),
+        Index("ix_cards_language_difficulty", "language", "difficulty_level"),
+        Index("ix_cards_difficulty_level", "difficulty_level"),
+    )
 
 class UserCardProgress(Base):
     """Прогресс конкретного пользователя по конкретной карточке"""
@@ -33,12 +57,70 @@ class UserCardProgress(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    card_id = Column(Integer, ForeignKey("cards.id"), nullable=False)
+    card_id = Column(Integer, ForeignKey("cards.id", ondelete="CASCADE"), nullable=False)
     correct_answers = Column(Integer, default=0)
     total_attempts = Column(Integer, default=0)
+    # Расписание повторений (SM-2), см. app/scheduler.py
+    due_at = Column(
+        DateTime(timezone=True).with_variant(SQLITE_TIMESTAMP, "sqlite"),
+        server_default=func.now()
+    )
+    interval_days = Column(Integer, default=0, nullable=False, server_default="0")
+    ease = Column(Float, default=2.5, nullable=False, server_default="2.5")
+    streak = Column(Integer, default=0, nullable=False, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     __table_args__ = (
         UniqueConstraint('user_id', 'card_id', name='unique_user_card'),
-    )
\ No newline at end of file
+        Index("ix_user_card_progress_user_due", "user_id", "due_at"),
+        Index("ix_user_card_progress_card_id", "card_id"),
+    )
+
+class UserStats(Base):
+    """Накопленная статистика пользователя (сводка по user_card_progress)"""
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_reviews = Column(Integer, default=0, nullable=False)
+    total_correct = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class NewCardPointer(Base):
+    """До какой карточки каталог уже выдан пользователю (см. crud.introduce_new_cards)"""
+    __tablename__ = "new_card_pointers"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_card_id = Column(Integer, default=0, nullable=False, index=True)
+
+class Counter(Base):
+    """Глобальные счётчики (например, число карточек в каталоге)"""
+    __tablename__ = "counters"
+    
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+class Job(Base):
+    """Фоновая задача администратора (см. app/jobs.py)"""
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    # queued -> running -> succeeded | failed
+    status = Column(String, nullable=False, default="queued")
+    params = Column(JSON, nullable=True)
+    progress = Column(Integer, default=0, nullable=False)
+    total = Column(Integer, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Воркер, выполняющий задачу, и время его последнего heartbeat
+    owner = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_jobs_status", "status"),
+    )
@@ -0,0 +1,260 @@
+"""Ограничение частоты запросов по маршрутам
+
+Лимиты задаются строками вида "10/minute" и подключаются к маршруту
+зависимостью rate_limit(...). Ключ — user_id из JWT или IP клиента.
+
+Хранилища:
+  memory — token bucket в памяти процесса (по умолчанию). Всё работает
+           в одном event loop без await между чтением и записью, поэтому
+           блокировки не нужны; у каждого воркера свой счётчик.
+  redis  — скользящее окно в Redis-совместимом хранилище (RATE_LIMIT_REDIS_URL,
+           нужен пакет redis), общее для всех воркеров.
+  local  — то же скользящее окно поверх LocalStore: локальная замена Redis
+           для разработки и проверки.
+
+Отклонённые запросы в обоих хранилищах не расходуют лимит: Retry-After
+не растёт от того, что клиент продолжает слать запросы. Заголовки
+X-RateLimit-* добавляются и к ошибкам, которые вернул сам обработчик
+(например, 401 при неверном пароле).
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+import math
+import os
+import time
+from dotenv import load_dotenv
+
+from fastapi import HTTPException, Request, Response, status
+from jose import JWTError
+
+from app.cache import TTLCache
+
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Лимиты маршрутов
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/minute")
+RATE_LIMIT_TEST_SUBMIT = os.getenv("RATE_LIMIT_TEST_SUBMIT", "30/minute")
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+@dataclass(frozen=True)
+class RateLimit:
+    requests: int
+    period: float
+
+    @classmethod
+    def parse(cls, value: str) -> Optional["RateLimit"]:
+        """'10/minute' -> RateLimit(10, 60); пустая строка или 'off' — без лимита"""
+        value = value.strip().lower()
+        if not value or value == "off":
+            return None
+        requests, _, period = value.partition("/")
+        if period not in PERIODS:
+            raise ValueError(f"Unknown rate limit period: {value}")
+        return cls(int(requests), PERIODS[period])
+
+@dataclass
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float = 0.0
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+class MemoryBackend:
+    """Token bucket в памяти процесса"""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        # Полностью восполненная корзина ничем не отличается от отсутствующей,
+        # поэтому запись живёт только до момента полного восполнения
+        self._buckets = TTLCache(maxsize=maxsize, ttl=max(PERIODS.values()))
+        self.clock = clock
+
+    async def hit(self, key: str, limit: RateLimit) -> Decision:
+        now = self.clock()
+        rate = limit.requests / limit.period
+
+        tokens, updated_at = self._buckets.get(key, (float(limit.requests), now))
+        tokens = min(float(limit.requests), tokens + (now - updated_at) * rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+
+        reset_after = (limit.requests - tokens) / rate
+        self._buckets.set(key, (tokens, now), ttl=reset_after)
+
+        return Decision(
+            allowed=allowed,
+            limit=limit.requests,
+            remaining=int(tokens),
+            reset_after=reset_after,
+            retry_after=0.0 if allowed else (1 - tokens) / rate,
+        )
+
+class LocalStore:
+    """Подмножество команд Redis (get/incr/decr/expire) в памяти процесса"""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MAX_KEYS):
+        self._data = TTLCache(maxsize=maxsize, ttl=2 * max(PERIODS.values()))
+
+    async def get(self, key: str) -> Optional[int]:
+        entry = self._data.get(key)
+        return entry[0] if entry is not None else None
+
+    async def incr(self, key: str) -> int:
+        entry = self._data.get(key)
+        if entry is None:
+            entry = [0]
+            self._data.set(key, entry)
+        entry[0] += 1
+        return entry[0]
+
+    async def decr(self, key: str) -> int:
+        entry = self._data.get(key)
+        if entry is None:
+            entry = [0]
+            self._data.set(key, entry)
+        entry[0] -= 1
+        return entry[0]
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        self._data.set(key, entry, ttl=seconds)
+        return True
+
+class SharedStoreBackend:
+    """Скользящее окно поверх Redis-совместимого хранилища
+
+    Число запросов оценивается как счётчик текущего окна плюс доля счётчика
+    предыдущего окна, которая ещё попадает в последние period секунд.
+    Отклонённый запрос сразу вычитается из счётчика обратно.
+    """
+
+    def __init__(self, store, prefix: str = "ratelimit", clock: Callable[[], float] = time.time):
+        self.store = store
+        self.prefix = prefix
+        self.clock = clock
+
+    @staticmethod
+    def _retry_after(limit: RateLimit, previous: int, current: int, elapsed: float) -> float:
+        """Через сколько секунд пройдёт ещё один запрос при счётчиках без него"""
+        if current + 1 <= limit.requests and previous:
+            # Ещё в этом окне, когда доля предыдущего окна достаточно уменьшится
+            passes_at = 1 - (limit.requests - current - 1) / previous
+            return limit.period * max(0.0, passes_at - elapsed)
+        # В следующем окне текущий счётчик станет предыдущим
+        passes_at = 1 - (limit.requests - 1) / current if current else 0.0
+        return limit.period * (1 - elapsed + max(0.0, passes_at))
+
+    async def hit(self, key: str, limit: RateLimit) -> Decision:
+        now = self.clock()
+        window = int(now // limit.period)
+        elapsed = (now % limit.period) / limit.period
+
+        current_key = f"{self.prefix}:{key}:{window}"
+        current = await self.store.incr(current_key)
+        if current == 1:
+            await self.store.expire(current_key, math.ceil(limit.period * 2))
+        previous = int(await self.store.get(f"{self.prefix}:{key}:{window - 1}") or 0)
+
+        estimated = previous * (1 - elapsed) + current
+        allowed = estimated <= limit.requests
+        reset_after = limit.period * (1 - elapsed)
+
+        retry_after = 0.0
+        if not allowed:
+            current = await self.store.decr(current_key)
+            estimated -= 1
+            retry_after = self._retry_after(limit, previous, current, elapsed)
+
+        return Decision(
+            allowed=allowed,
+            limit=limit.requests,
+            remaining=max(0, int(limit.requests - estimated)),
+            reset_after=reset_after,
+            retry_after=retry_after,
+        )
+
+def _create_backend():
+    if RATE_LIMIT_STORAGE == "redis":
+        import redis.asyncio as redis
+
+        return SharedStoreBackend(redis.from_url(RATE_LIMIT_REDIS_URL))
+    if RATE_LIMIT_STORAGE == "local":
+        return SharedStoreBackend(LocalStore())
+    return MemoryBackend()
+
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = _create_backend()
+    return _backend
+
+def set_backend(backend):
+    """Подменить хранилище лимитов (например, SharedStoreBackend(LocalStore()))"""
+    global _backend
+    _backend = backend
+
+def client_ip(request: Request) -> str:
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def user_or_ip(request: Request) -> str:
+    """user_id из Bearer-токена, для анонимных запросов — IP клиента"""
+    from app.auth import _decode_token
+
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            user_id = _decode_token(token).get("user_id")
+        except JWTError:
+            user_id = None
+        if user_id is not None:
+            return f"user:{user_id}"
+    return client_ip(request)
+
+def rate_limit(name: str, limit: str, key: Callable[[Request], str] = client_ip):
+    """Зависимость FastAPI, ограничивающая частоту запросов к маршруту"""
+    parsed = RateLimit.parse(limit)
+
+    async def dependency(request: Request, response: Response):
+        if not RATE_LIMIT_ENABLED or parsed is None:
+            yield
+            return
+
+        decision = await get_backend().hit(f"{name}:{key(request)}", parsed)
+        headers = decision.headers()
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers=headers,
+            )
+        response.headers.update(headers)
+        try:
+            yield
+        except HTTPException as e:
+            # Заголовки ответа-заглушки теряются, если обработчик вернул ошибку
+            e.headers = {**headers, **(e.headers or {})}
+            raise
+
+    return dependency
@@ -0,0 +1,58 @@
+"""Быстрая отдача карточек в JSON
+
+Карточки один раз превращаются в CardResponse (from_attributes), а ответ
+сериализуется pydantic-core напрямую: без повторной валидации по
+response_model и без jsonable_encoder.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app import models, schemas
+
+card_adapter = TypeAdapter(schemas.CardResponse)
+card_list_adapter = TypeAdapter(List[schemas.CardResponse])
+
+class ModelResponse(Response):
+    """JSON-ответ из уже проверенных pydantic-моделей"""
+    media_type = "application/json"
+
+    def __init__(self, content: Any, adapter: TypeAdapter, **kwargs):
+        self.adapter = adapter
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        return self.adapter.dump_json(content)
+
+_CARD_COLUMNS = frozenset(column.key for column in models.Card.__table__.columns)
+
+def card_model(card: models.Card) -> schemas.CardResponse:
+    # Загруженные столбцы лежат в __dict__ экземпляра: валидация словаря
+    # заметно быстрее, чем from_attributes через дескрипторы SQLAlchemy
+    state = card.__dict__
+    if _CARD_COLUMNS.issubset(state):
+        return schemas.CardResponse.model_validate(state)
+    return schemas.CardResponse.model_validate(card)
+
+def with_progress(
+    card: schemas.CardResponse, progress: Optional[Dict[str, Any]]
+) -> schemas.CardResponse:
+    if not progress:
+        return card
+    return card.model_copy(update={"user_progress": progress})
+
+def card_response(
+    card: schemas.CardResponse,
+    progress: Optional[Dict[str, Any]] = None,
+    headers: Optional[Mapping[str, str]] = None,
+) -> ModelResponse:
+    return ModelResponse(with_progress(card, progress), card_adapter, headers=headers)
+
+def cards_response(
+    cards: Sequence[schemas.CardResponse],
+    progress_by_card: Mapping[int, Dict[str, Any]],
+    headers: Optional[Mapping[str, str]] = None,
+) -> ModelResponse:
+    content = [with_progress(card, progress_by_card.get(card.id)) for card in cards]
+    return ModelResponse(content, card_list_adapter, headers=headers)
@@ -0,0 +1,39 @@
+"""Обслуживание сводок статистики
+
+    python -m app.rollups rebuild   # пересчитать user_stats и счётчик карточек
+    python -m app.rollups verify    # сравнить сводки с данными, код 1 при расхождениях
+"""
+import argparse
+import asyncio
+import sys
+
+from app import crud
+from app.database import AsyncSessionLocal, close_db
+
+async def run(command: str) -> int:
+    async with AsyncSessionLocal() as session:
+        if command == "rebuild":
+            result = await crud.rebuild_progress_rollups(session)
+            print(f"✅ Rollups rebuilt: {result['users']} users, {result['total_cards']} cards")
+            return 0
+
+        mismatches = await crud.verify_progress_rollups(session)
+        for mismatch in mismatches:
+            print(f"❌ {mismatch}")
+        if mismatches:
+            print(f"❌ {len(mismatches)} rollup mismatches found")
+            return 1
+        print("✅ Rollups are consistent")
+        return 0
+
+async def main(command: str) -> int:
+    try:
+        return await run(command)
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or verify progress rollups")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.command)))
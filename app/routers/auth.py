@@ -6,13 +6,17 @@ from pydantic import BaseModel
 
 from app import crud, schemas
 from app.auth import (
-    verify_password, create_access_token, 
+    averify_password, create_access_token, schedule_password_rehash,
     get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from app.database import get_db
+from app.ratelimit import RATE_LIMIT_LOGIN, client_ip, rate_limit
 
 router = APIRouter()
 
+# Перебор паролей и нагрузка на bcrypt ограничиваются по IP клиента
+login_rate_limit = rate_limit("login", RATE_LIMIT_LOGIN, key=client_ip)
+
 @router.post("/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(
     user_data: schemas.UserCreate,
@@ -35,7 +39,7 @@ async def register(
     user = await crud.create_user(db=db, user=user_data)
     return user
 
-@router.post("/login", response_model=schemas.Token)
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(login_rate_limit)])
 async def oauth2_login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db)
@@ -45,13 +49,15 @@ async def oauth2_login(
 async def _perform_login(username: str, password: str, db: AsyncSession):
     user = await crud.get_user_by_username(db, username=username)
     
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await averify_password(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    schedule_password_rehash(user.id, password, user.hashed_password)
+    
     if not user.is_active:
         raise HTTPException(
             status_code=400,
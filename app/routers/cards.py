@@ -1,77 +1,204 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pydantic import ValidationError
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+import csv
+import io
+import json
 
-from app import crud, schemas, models
-from app.auth import get_current_active_user, require_admin
-from app.database import get_db
+from app import catalog, crud, database, responses, schemas, models
+from app.auth import get_current_active_user, get_user_read_db, require_admin
+from app.database import get_db, read_sessionmaker_for
 
 router = APIRouter()
 
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+@asynccontextmanager
+async def _catalog_session(db: AsyncSession):
+    """Сессия для заполнения кэша каталога
+    
+    Сразу после изменения каталога реплика может отставать: карточки
+    читаются из основной БД, чтобы не закэшировать старые строки
+    под новой версией каталога.
+    """
+    if not catalog.recently_changed() or database.ReadSessionLocal is database.AsyncSessionLocal:
+        yield db
+        return
+    async with database.AsyncSessionLocal() as session:
+        yield session
+
 @router.get("/", response_model=List[schemas.CardResponse])
 async def get_all_cards(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_user_read_db)
 ):
-    """Получить все карточки"""
-    cards = await crud.get_all_cards(db, skip=skip, limit=limit)
-    
-    result_cards = []
-    for card in cards:
-        card_dict = {
-            "id": card.id,
-            "foreign_word": card.foreign_word,
-            "translation": card.translation,
-            "example_sentence": card.example_sentence,
-            "language": card.language,
-            "difficulty_level": card.difficulty_level,
-            "created_by": card.created_by,
-            "created_at": card.created_at,
-            "updated_at": card.updated_at,
-        }
-        
-        progress = await crud.get_user_progress_for_card(db, current_user.id, card.id)
-        if progress:
-            card_dict["user_progress"] = progress
-        
-        result_cards.append(card_dict)
+    """Получить все карточки
+    
+    Для глубокого постраничного обхода передавайте cursor из заголовка
+    X-Next-Cursor предыдущего ответа: skip в этом режиме игнорируется.
+    """
+    position = None
+    if cursor:
+        try:
+            position = crud.decode_card_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid cursor"
+            )
+    
+    page_key = (cursor, limit) if cursor else (skip, limit)
+    page = catalog.get_page(page_key)
+    if page is None:
+        loaded_version = catalog.version
+        async with _catalog_session(db) as catalog_db:
+            cards = await crud.get_all_cards(catalog_db, skip=skip, limit=limit, cursor=position)
+        page = catalog.set_page(
+            page_key, [responses.card_model(card) for card in cards], loaded_version
+        )
+    card_models, content_digest = page
+    
+    headers = {}
+    if card_models and len(card_models) == limit:
+        last_card = card_models[-1]
+        headers["X-Next-Cursor"] = crud.encode_card_cursor(last_card.created_at, last_card.id)
+    
+    progress_by_card = await crud.get_user_progress_for_cards(
+        db, current_user.id, [card.id for card in card_models]
+    )
+    
+    etag = catalog.make_etag(content_digest, sorted(progress_by_card.items()))
+    if catalog.etag_matches(request.headers.get("if-none-match"), etag):
+        return _not_modified(etag)
+    headers["ETag"] = etag
+    
+    return responses.cards_response(card_models, progress_by_card, headers=headers)
+
+@router.get("/search", response_model=List[schemas.CardResponse])
+async def search_cards(
+    q: Optional[str] = None,
+    language: Optional[str] = None,
+    difficulty_level: Optional[int] = None,
+    prefix: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_user_read_db)
+):
+    """Поиск карточек: полнотекстовый запрос q с ранжированием,
+    фильтры по языку, уровню сложности и началу иностранного слова"""
+    cards = await crud.search_cards(
+        db,
+        query=q,
+        language=language,
+        difficulty_level=difficulty_level,
+        prefix=prefix,
+        skip=skip,
+        limit=limit,
+    )
+    
+    progress_by_card = await crud.get_user_progress_for_cards(
+        db, current_user.id, [card.id for card in cards]
+    )
+    
+    return responses.cards_response(
+        [responses.card_model(card) for card in cards], progress_by_card
+    )
+
+EXPORT_BATCH_SIZE = 1000
+PROGRESS_EXPORT_COLUMNS = ["correct_answers", "total_attempts"]
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def _export_rows(fmt: str, user_id: Optional[int], session_factory) -> AsyncIterator[str]:
+    columns = crud.CARD_EXPORT_COLUMNS
+    if user_id is not None:
+        columns = columns + PROGRESS_EXPORT_COLUMNS
     
-    return result_cards
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(columns)
+    
+    # Отдельная сессия живёт ровно столько, сколько идёт выгрузка
+    async with session_factory() as session:
+        rows_in_buffer = 0
+        async for row in crud.stream_cards(session, user_id=user_id, batch_size=EXPORT_BATCH_SIZE):
+            values = [_export_value(row[column]) for column in columns]
+            if fmt == "csv":
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+                buffer.write("\n")
+            
+            rows_in_buffer += 1
+            if rows_in_buffer >= EXPORT_BATCH_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                rows_in_buffer = 0
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get("/export")
+async def export_cards(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    include_progress: bool = False,
+    current_user = Depends(get_current_active_user)
+):
+    """Потоковая выгрузка всего каталога в NDJSON или CSV"""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    user_id = current_user.id if include_progress else None
+    
+    return StreamingResponse(
+        _export_rows(format, user_id, read_sessionmaker_for(current_user.id)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="cards.{format}"'},
+    )
 
 @router.get("/{card_id}", response_model=schemas.CardResponse)
 async def get_card(
     card_id: int,
+    request: Request,
     current_user = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_user_read_db)
 ):
     """Получить конкретную карточку"""
-    card = await crud.get_card(db, card_id=card_id)
-    
-    if not card:
-        raise HTTPException(
-            status_code=404,
-            detail="Card not found"
-        )
+    entry = catalog.get_card(card_id)
+    if entry is None:
+        loaded_version = catalog.version
+        async with _catalog_session(db) as catalog_db:
+            card = await crud.get_card(catalog_db, card_id=card_id)
+        
+        if not card:
+            raise HTTPException(
+                status_code=404,
+                detail="Card not found"
+            )
+        
+        entry = catalog.set_card(card_id, responses.card_model(card), loaded_version)
+    card, content_digest = entry
     
-    card_dict = {
-        "id": card.id,
-        "foreign_word": card.foreign_word,
-        "translation": card.translation,
-        "example_sentence": card.example_sentence,
-        "language": card.language,
-        "difficulty_level": card.difficulty_level,
-        "created_by": card.created_by,
-        "created_at": card.created_at,
-        "updated_at": card.updated_at,
-    }
+    progress = await crud.get_user_progress_for_card(db, current_user.id, card_id)
     
-    progress = await crud.get_user_progress_for_card(db, current_user.id, card.id)
-    if progress:
-        card_dict["user_progress"] = progress
+    etag = catalog.make_etag(content_digest, progress)
+    if catalog.etag_matches(request.headers.get("if-none-match"), etag):
+        return _not_modified(etag)
     
-    return card_dict
+    return responses.card_response(card, progress, headers={"ETag": etag})
 
 @router.post("/", response_model=schemas.CardResponse, status_code=status.HTTP_201_CREATED)
 async def create_card(
@@ -82,6 +209,120 @@ async def create_card(
     """Создать новую карточку"""
     return await crud.create_card(db=db, card=card_data, admin_id=current_user.id)
 
+IMPORT_TRANSACTION_ROWS = 10000
+IMPORT_MAX_REPORTED_ERRORS = 1000
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+def _csv_records(lines) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    for row, record in enumerate(csv.DictReader(lines), start=1):
+        # Пустые ячейки CSV — значения по умолчанию из схемы
+        yield row, {key: value for key, value in record.items() if key and value != ""}, None
+
+async def _iter_import_rows(request: Request) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+    """Строки импорта: (номер строки, запись, ошибка разбора)"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type in NDJSON_CONTENT_TYPES:
+        row = 0
+        pending = b""
+        async for chunk in request.stream():
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                row += 1
+                if line.strip():
+                    yield _parse_ndjson_line(row, line)
+        if pending.strip():
+            yield _parse_ndjson_line(row + 1, pending)
+    
+    elif content_type == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(
+                status_code=400,
+                detail="CSV file is required in the 'file' field"
+            )
+        for item in _csv_records(io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")):
+            yield item
+    
+    elif content_type == "text/csv":
+        body = await request.body()
+        for item in _csv_records(io.StringIO(body.decode("utf-8-sig"), newline="")):
+            yield item
+    
+    else:
+        try:
+            data = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid JSON body"
+            )
+        if not isinstance(data, list):
+            raise HTTPException(
+                status_code=400,
+                detail="Expected a JSON array of cards"
+            )
+        for row, record in enumerate(data, start=1):
+            yield row, record, None
+
+def _parse_ndjson_line(row: int, line: bytes) -> Tuple[int, Any, Optional[str]]:
+    try:
+        return row, json.loads(line), None
+    except ValueError:
+        return row, None, "Invalid JSON"
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+@router.post("/import", response_model=schemas.CardImportResult)
+async def import_cards(
+    request: Request,
+    current_user: models.User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Массовый импорт карточек: JSON-массив, NDJSON-поток или CSV-файл"""
+    total_rows = 0
+    imported = 0
+    errors = []
+    failed = 0
+    batch = []
+    
+    async for row, record, error in _iter_import_rows(request):
+        total_rows += 1
+        
+        if error is None:
+            if not isinstance(record, dict):
+                error = "Row must be an object"
+            else:
+                try:
+                    batch.append(schemas.CardCreate(**record))
+                except ValidationError as e:
+                    error = _validation_message(e)
+        
+        if error is not None:
+            failed += 1
+            if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                errors.append({"row": row, "error": error})
+            continue
+        
+        if len(batch) >= IMPORT_TRANSACTION_ROWS:
+            imported += await crud.bulk_create_cards(db, batch, admin_id=current_user.id)
+            batch = []
+    
+    imported += await crud.bulk_create_cards(db, batch, admin_id=current_user.id)
+    
+    return {
+        "total_rows": total_rows,
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+    }
+
 @router.put("/{card_id}", response_model=schemas.CardResponse)
 async def update_card(
     card_id: int,
@@ -90,7 +331,7 @@ async def update_card(
     db: AsyncSession = Depends(get_db)
 ):
     """Обновить карточку"""
-    card = await crud.update_card(db, card_id=card_id, card_update=card_update)
+    card = await crud.update_card(db, card_id=card_id, card_update=card_update, admin_id=current_user.id)
     
     if not card:
         raise HTTPException(
@@ -107,7 +348,7 @@ async def delete_card(
     db: AsyncSession = Depends(get_db)
 ):
     """Удалить карточку"""
-    success = await crud.delete_card(db, card_id=card_id)
+    success = await crud.delete_card(db, card_id=card_id, admin_id=current_user.id)
     
     if not success:
         raise HTTPException(
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import jobs, schemas, models
+from app.auth import require_admin
+from app.database import get_db
+
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=schemas.JobResponse)
+async def get_job(
+    job_id: int,
+    current_user: models.User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Статус и прогресс фоновой задачи"""
+    job = await jobs.get_job(db, job_id)
+
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail="Job not found"
+        )
+
+    return job
+
+@router.post("/cards/delete", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def delete_cards(
+    data: schemas.CardBulkDelete,
+    current_user: models.User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Удалить карточки в фоне: по списку card_ids или по языку и уровню сложности"""
+    if data.card_ids is None and data.language is None and data.difficulty_level is None:
+        raise HTTPException(
+            status_code=400,
+            detail="card_ids, language or difficulty_level is required"
+        )
+    
+    return await jobs.submit(db, "delete_cards", data.dict(exclude_none=True), current_user.id)
+
+@router.post("/stats/rebuild", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def rebuild_stats(
+    current_user: models.User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Пересчитать сводки статистики в фоне"""
+    return await jobs.submit(db, "rebuild_stats", None, current_user.id)
+
+@router.post("/cards/reindex", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def reindex_cards(
+    current_user: models.User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Перестроить поисковый индекс и индекс проверки ответов в фоне"""
+    return await jobs.submit(db, "reindex_cards", None, current_user.id)
@@ -1,30 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app import crud, schemas, models
-from app.auth import get_current_active_user
+from app import crud, grading, responses, schemas, writebehind
+from app.auth import get_current_active_user, get_user_read_db
 from app.database import get_db
+from app.ratelimit import RATE_LIMIT_TEST_SUBMIT, rate_limit, user_or_ip
 
 router = APIRouter()
 
+submit_rate_limit = rate_limit("test_submit", RATE_LIMIT_TEST_SUBMIT, key=user_or_ip)
+
 @router.get("/", response_model=schemas.ProgressStats)
 async def get_progress_stats(
     current_user = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_user_read_db)
 ):
     """Получение статистики прогресса изучения"""
     stats = await crud.get_user_progress_stats(db, user_id=current_user.id)
-    return stats
+    return writebehind.with_pending(stats, current_user.id)
 
 @router.get("/test", response_model=List[schemas.CardResponse])
 async def get_test_cards(
     limit: int = 10,
+    mode: str = Query("due", pattern="^(due|random)$"),
     current_user = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_user_read_db),
+    write_db: AsyncSession = Depends(get_db)
 ):
-    """Получение карточек для тестирования"""
-    cards = await crud.get_random_cards_for_user(db, user_id=current_user.id, limit=limit)
+    """Получение карточек для тестирования
+    
+    mode=due — карточки по расписанию повторений (новые карточки
+    выдаются записью в основную БД), mode=random — прежняя случайная
+    выборка с весами по числу попыток.
+    """
+    if mode == "random":
+        cards = await crud.get_random_cards_for_user(db, user_id=current_user.id, limit=limit)
+    else:
+        cards = await crud.get_due_cards_for_user(
+            db, user_id=current_user.id, limit=limit, write_db=write_db
+        )
     
     if not cards:
         raise HTTPException(
@@ -32,52 +47,45 @@ async def get_test_cards(
             detail="No cards available for testing"
         )
     
-    result_cards = []
-    for card in cards:
-        card_dict = {
-            "id": card.id,
-            "foreign_word": card.foreign_word,
-            "translation": card.translation,
-            "example_sentence": card.example_sentence,
-            "language": card.language,
-            "difficulty_level": card.difficulty_level,
-            "created_by": card.created_by,
-            "created_at": card.created_at,
-            "updated_at": card.updated_at,
-        }
-        
-        progress = await crud.get_user_progress_for_card(db, current_user.id, card.id)
-        if progress:
-            card_dict["user_progress"] = progress
-        
-        result_cards.append(card_dict)
+    progress_by_card = await crud.get_user_progress_for_cards(
+        db, current_user.id, [card.id for card in cards]
+    )
     
-    return result_cards
+    return responses.cards_response(
+        [responses.card_model(card) for card in cards], progress_by_card
+    )
 
-@router.post("/test", response_model=schemas.TestResult)
+@router.post("/test", response_model=schemas.TestResult, dependencies=[Depends(submit_rate_limit)])
 async def submit_test(
     test_data: schemas.TestSubmission,
     current_user = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Отправка результатов теста"""
-    correct_answers = 0
+    outcomes = {}
+    
+    # Допустимые ответы берутся из индекса в памяти, без чтения карточек из БД
+    accepted_by_card = await grading.get_answers(
+        db, [answer.card_id for answer in test_data.answers]
+    )
     
     for answer in test_data.answers:
-        card = await crud.get_card(db, card_id=answer.card_id)
+        accepted = accepted_by_card.get(answer.card_id)
         
-        if card:
-            is_correct = answer.user_answer.strip().lower() == card.translation.lower()
-            
-            if is_correct:
-                correct_answers += 1
-            
-            await crud.update_user_progress(
-                db, 
-                user_id=current_user.id, 
-                card_id=card.id, 
-                is_correct=is_correct
-            )
+        if accepted is not None:
+            is_correct = grading.is_correct(answer.user_answer, accepted)
+            outcomes.setdefault((current_user.id, answer.card_id), []).append(is_correct)
+    
+    if writebehind.enabled():
+        writebehind.add(outcomes)
+    else:
+        # Карточку могли удалить в другом воркере, пока она была в индексе
+        missing = await crud.apply_progress_outcomes(db, outcomes)
+        outcomes = {key: results for key, results in outcomes.items() if key[1] not in missing}
+    
+    correct_answers = sum(
+        1 for results in outcomes.values() for is_correct in results if is_correct
+    )
     
     score_percentage = 0
     if test_data.answers:
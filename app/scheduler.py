@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+# Интервальное повторение по алгоритму SM-2: правильный ответ считается
+# оценкой 5, ошибка — оценкой 2 (карточка начинает цикл заново)
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+CORRECT_QUALITY = 5
+WRONG_QUALITY = 2
+
+@dataclass
+class ReviewState:
+    interval_days: int = 0
+    ease: float = DEFAULT_EASE
+    streak: int = 0
+    due_at: Optional[datetime] = None
+
+def review(state: ReviewState, is_correct: bool, now: datetime) -> ReviewState:
+    """Новое состояние карточки после одного ответа"""
+    quality = CORRECT_QUALITY if is_correct else WRONG_QUALITY
+
+    ease = state.ease + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    ease = max(MIN_EASE, ease)
+
+    if is_correct:
+        streak = state.streak + 1
+        if streak == 1:
+            interval_days = 1
+        elif streak == 2:
+            interval_days = 6
+        else:
+            interval_days = max(1, round(state.interval_days * state.ease))
+    else:
+        streak = 0
+        interval_days = 1
+
+    return ReviewState(
+        interval_days=interval_days,
+        ease=round(ease, 4),
+        streak=streak,
+        due_at=now + timedelta(days=interval_days),
+    )
+
+def review_many(state: ReviewState, results: Iterable[bool], now: datetime) -> ReviewState:
+    """Применить ответы по одной карточке в порядке поступления"""
+    for is_correct in results:
+        state = review(state, is_correct, now)
+    return state
@@ -63,6 +63,16 @@ class CardResponse(CardBase):
     class Config:
         from_attributes = True
 
+class CardImportError(BaseModel):
+    row: int
+    error: str
+
+class CardImportResult(BaseModel):
+    total_rows: int
+    imported: int
+    failed: int
+    errors: List[CardImportError]
+
 class ProgressStats(BaseModel):
     total_cards: int
     total_reviews: int
@@ -79,4 +89,24 @@ class TestSubmission(BaseModel):
 class TestResult(BaseModel):
     total_questions: int
     correct_answers: int
-    score_percentage: float
\ No newline at end of file
+    score_percentage: float
+
+class CardBulkDelete(BaseModel):
+    card_ids: Optional[List[int]] = None
+    language: Optional[str] = None
+    difficulty_level: Optional[int] = None
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: int
+    total: Optional[int]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
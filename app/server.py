@@ -0,0 +1,84 @@
+"""Запуск API в продакшене
+
+    python -m app.server                    # воркеров по числу ядер
+    python -m app.server --workers 4 --port 8080
+
+Схема БД и администратор создаются один раз в родительском процессе,
+после чего воркеры uvicorn стартуют с SKIP_INIT_DB=1. Каждый воркер —
+отдельный процесс со своим движком SQLAlchemy и пулом соединений.
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+from dotenv import load_dotenv
+
+import uvicorn
+
+# app.main первым: он импортирует crud раньше auth (иначе цикл импортов)
+from app import main  # noqa: F401
+from app.auth import shutdown_password_hasher
+from app.database import close_db, init_db
+
+load_dotenv()
+
+def default_workers() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _optional_int(value):
+    return int(value) if value else None
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or default_workers()
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+KEEP_ALIVE_SECONDS = int(os.getenv("KEEP_ALIVE_SECONDS", "5"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+LIMIT_CONCURRENCY = _optional_int(os.getenv("LIMIT_CONCURRENCY"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+
+def event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+async def prepare_database():
+    """Создать таблицы, применить миграции и создать администратора"""
+    try:
+        await init_db()
+    finally:
+        await shutdown_password_hasher()
+        await close_db()
+
+def run(args: argparse.Namespace):
+    asyncio.run(prepare_database())
+    os.environ["SKIP_INIT_DB"] = "1"
+
+    loop, http = event_loop(), http_protocol()
+    print(f"🚀 Starting {args.workers} workers on {args.host}:{args.port} ({loop}, {http})")
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=loop,
+        http=http,
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        limit_concurrency=args.limit_concurrency,
+        proxy_headers=True,
+        log_level=LOG_LEVEL,
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API with several uvicorn workers")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY, help="defaults to the number of CPU cores")
+    parser.add_argument("--keep-alive", type=int, default=KEEP_ALIVE_SECONDS, help="seconds to keep idle connections open")
+    parser.add_argument("--backlog", type=int, default=BACKLOG)
+    parser.add_argument("--limit-concurrency", type=int, default=LIMIT_CONCURRENCY, help="connections per worker before 503")
+    run(parser.parse_args())
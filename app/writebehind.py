@@ -0,0 +1,150 @@
+"""Отложенная запись ответов на тесты (WRITE_BEHIND=true)
+
+Проверенные ответы складываются в буфер процесса, где объединяются по
+(user_id, card_id), а фоновая задача из main.lifespan записывает их одним
+пакетом через crud.apply_progress_outcomes каждые WRITE_BEHIND_FLUSH_MS мс
+или сразу по накоплении WRITE_BEHIND_MAX_ENTRIES пар. При остановке буфер
+сбрасывается полностью.
+
+Ещё не записанные ответы добавляются к статистике в GET /progress только
+из буфера того же процесса. С одним воркером ответ виден сразу; с
+несколькими запрос может попасть в другой воркер и увидит ответ только
+после сброса буфера, то есть не позже чем через WRITE_BEHIND_FLUSH_MS мс.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+WRITE_BEHIND_MAX_ENTRIES = int(os.getenv("WRITE_BEHIND_MAX_ENTRIES", "5000"))
+
+Outcomes = Dict[Tuple[int, int], List[bool]]
+
+_pending: Outcomes = {}
+# user_id -> [ответов, правильных] ещё не записанных в БД
+_unflushed: Dict[int, List[int]] = {}
+_flush_requested: Optional[asyncio.Event] = None
+_task: Optional[asyncio.Task] = None
+_stopping = False
+
+def enabled() -> bool:
+    return WRITE_BEHIND and _task is not None
+
+def add(outcomes: Outcomes):
+    """Поставить результаты ответов в очередь на запись"""
+    for (user_id, card_id), results in outcomes.items():
+        if not results:
+            continue
+        _pending.setdefault((user_id, card_id), []).extend(results)
+        totals = _unflushed.setdefault(user_id, [0, 0])
+        totals[0] += len(results)
+        totals[1] += sum(1 for is_correct in results if is_correct)
+
+    if len(_pending) >= WRITE_BEHIND_MAX_ENTRIES and _flush_requested is not None:
+        _flush_requested.set()
+
+def _forget(user_id: int, results: List[bool]):
+    totals = _unflushed.get(user_id)
+    if totals is None:
+        return
+    totals[0] -= len(results)
+    totals[1] -= sum(1 for is_correct in results if is_correct)
+    if totals[0] <= 0:
+        del _unflushed[user_id]
+
+def discard_cards(card_ids: Iterable[int]):
+    """Выбросить ожидающие записи ответы по удалённым карточкам"""
+    card_ids = set(card_ids)
+    for key in [key for key in _pending if key[1] in card_ids]:
+        _forget(key[0], _pending.pop(key))
+
+def pending_totals(user_id: int) -> Tuple[int, int]:
+    """(ответов, правильных) пользователя, ожидающих записи"""
+    total_reviews, total_correct = _unflushed.get(user_id, (0, 0))
+    return total_reviews, total_correct
+
+def with_pending(stats: dict, user_id: int) -> dict:
+    """Статистика прогресса с учётом ещё не записанных ответов этого процесса"""
+    pending_reviews, pending_correct = pending_totals(user_id)
+    if not pending_reviews:
+        return stats
+
+    total_reviews = stats["total_reviews"] + pending_reviews
+    total_correct = stats["total_correct"] + pending_correct
+    return {
+        **stats,
+        "total_reviews": total_reviews,
+        "total_correct": total_correct,
+        "average_score": round(total_correct / total_reviews * 100, 2),
+    }
+
+async def flush() -> int:
+    """Записать накопленные ответы; вернуть число пар (user_id, card_id)"""
+    from app import crud
+    from app.database import AsyncSessionLocal
+
+    global _pending
+    if not _pending:
+        return 0
+
+    batch, _pending = _pending, {}
+    try:
+        # Ответы по удалённым тем временем карточкам crud пропускает сам
+        async with AsyncSessionLocal() as session:
+            await crud.apply_progress_outcomes(session, batch)
+    except Exception:
+        # Возвращаем пакет в буфер перед ответами, пришедшими за время записи
+        for key, results in _pending.items():
+            batch.setdefault(key, []).extend(results)
+        _pending = batch
+        raise
+
+    for (user_id, _), results in batch.items():
+        _forget(user_id, results)
+
+    return len(batch)
+
+async def _flush_loop():
+    # Задача не отменяется извне, чтобы не прервать запись пакета на середине;
+    # последний сброс при остановке делает stop()
+    while True:
+        try:
+            await asyncio.wait_for(_flush_requested.wait(), timeout=WRITE_BEHIND_FLUSH_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+        _flush_requested.clear()
+        if _stopping:
+            return
+
+        try:
+            await flush()
+        except Exception as e:
+            print(f"❌ Write-behind flush failed, will retry: {e}")
+
+async def start():
+    global _flush_requested, _task, _stopping
+    if not WRITE_BEHIND or _task is not None:
+        return
+    _stopping = False
+    _flush_requested = asyncio.Event()
+    _task = asyncio.create_task(_flush_loop())
+    print(f"✅ Write-behind enabled: flush every {WRITE_BEHIND_FLUSH_MS} ms or {WRITE_BEHIND_MAX_ENTRIES} entries")
+
+async def stop():
+    """Остановить фоновую запись и сбросить остаток буфера"""
+    global _task, _stopping
+    if _task is None:
+        return
+
+    _stopping = True
+    _flush_requested.set()
+    await _task
+    _task = None
+
+    flushed = await flush()
+    if flushed:
+        print(f"✅ Write-behind buffer flushed: {flushed} entries")
@@ -0,0 +1,424 @@
+"""Нагрузочный бенчмарк всех роутеров
+
+    python -m bench.run --users 50 --cards 10000 --progress 200 --requests 200
+    python -m bench.run --output after.json --compare before.json
+
+По умолчанию создаёт временную SQLite-базу, заполняет её и гоняет запросы
+через httpx.AsyncClient прямо в ASGI-приложение (без сети). С --base-url
+запросы идут в запущенный сервер (uvicorn), а база из DATABASE_URL
+заполняется напрямую — она должна совпадать с базой сервера.
+
+Для каждого сценария выводятся p50/p95/p99, пропускная способность и
+(в режиме ASGI) число SQL-запросов на один HTTP-запрос. Результаты
+сохраняются в JSON, чтобы сравнивать прогоны между собой.
+
+Настройки приложения берутся из окружения как обычно: например,
+SQLITE_PROFILE=production для сравнения профилей SQLite или
+CARD_CACHE_TTL_SECONDS=0, чтобы листинг карточек шёл мимо кэша каталога.
+"""
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_PASSWORD = "benchmark-password"
+SEED_CHUNK = 10000
+LANGUAGES = ["english", "german", "french", "spanish"]
+WORDS = ["house", "home", "water", "light", "river", "stone", "bread", "cloud", "green", "table"]
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+class QueryCounter:
+    """Считает SQL-запросы на движках приложения"""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._engines = {id(engine): engine for engine in engines}.values()
+        for engine in self._engines:
+            event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def close(self):
+        from sqlalchemy import event
+
+        for engine in self._engines:
+            event.remove(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+async def seed(args) -> Dict[str, int]:
+    """Заполнить базу пользователями, карточками и прогрессом"""
+    from sqlalchemy import func, insert, select
+
+    from app import crud, models
+    from app.auth import get_password_hash
+    from app.database import AsyncSessionLocal
+
+    rng = random.Random(args.seed)
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+
+    async with AsyncSessionLocal() as session:
+        admin = await crud.get_user_by_username(session, "admin")
+        existing_cards = (await session.execute(select(func.count(models.Card.id)))).scalar() or 0
+
+        first_user = (await session.execute(select(func.max(models.User.id)))).scalar() or 0
+        users = [
+            {
+                "username": f"bench_{first_user + i}",
+                "email": f"bench_{first_user + i}@example.com",
+                "hashed_password": hashed_password,
+                "role": "user",
+                "is_active": True,
+            }
+            for i in range(args.users)
+        ]
+        if users:
+            await session.execute(insert(models.User), users)
+
+        for start in range(0, args.cards, SEED_CHUNK):
+            chunk = [
+                {
+                    "foreign_word": f"{rng.choice(WORDS)}{start + i}",
+                    "translation": f"{rng.choice(WORDS)} {start + i}",
+                    "example_sentence": f"The {rng.choice(WORDS)} near the {rng.choice(WORDS)}",
+                    "language": rng.choice(LANGUAGES),
+                    "difficulty_level": rng.randint(1, 5),
+                    "created_by": admin.id if admin else None,
+                }
+                for i in range(min(SEED_CHUNK, args.cards - start))
+            ]
+            await session.execute(insert(models.Card), chunk)
+        await session.commit()
+
+        user_ids = (await session.execute(
+            select(models.User.id).where(models.User.id > first_user)
+        )).scalars().all()
+        card_ids = (await session.execute(select(models.Card.id))).scalars().all()
+
+        now = datetime.utcnow().replace(microsecond=0)
+        rows = []
+        for user_id in user_ids:
+            for card_id in rng.sample(card_ids, min(args.progress, len(card_ids))):
+                attempts = rng.randint(1, 12)
+                rows.append({
+                    "user_id": user_id,
+                    "card_id": card_id,
+                    "total_attempts": attempts,
+                    "correct_answers": rng.randint(0, attempts),
+                    "due_at": now + timedelta(days=rng.randint(-10, 10)),
+                    "interval_days": rng.randint(1, 30),
+                    "ease": 2.5,
+                    "streak": rng.randint(0, 5),
+                })
+                if len(rows) >= SEED_CHUNK:
+                    await session.execute(insert(models.UserCardProgress), rows)
+                    rows = []
+        if rows:
+            await session.execute(insert(models.UserCardProgress), rows)
+        await session.commit()
+
+        await crud.rebuild_progress_rollups(session)
+        await crud.rebuild_card_search_index(session)
+
+    return {"users": args.users, "cards": existing_cards + args.cards, "progress_per_user": args.progress}
+
+class Bench:
+    def __init__(self, client, counter: Optional[QueryCounter], args):
+        self.client = client
+        self.counter = counter
+        self.args = args
+        self.tokens: List[str] = []
+        self.card_ids: List[int] = []
+        self.cursors: List[str] = []
+        self.random_cursors: List[str] = []
+        self.rng = random.Random(args.seed)
+
+    def headers(self) -> dict:
+        return {"Authorization": "Bearer " + self.rng.choice(self.tokens)}
+
+    async def prepare(self):
+        from sqlalchemy import func, select
+
+        from app import crud, models
+        from app.database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as session:
+            usernames = (await session.execute(
+                select(models.User.username)
+                .where(models.User.username.like("bench\\_%", escape="\\"))
+                .limit(self.args.sessions)
+            )).scalars().all()
+            self.card_ids = (await session.execute(
+                select(models.Card.id).order_by(models.Card.id.desc()).limit(1000)
+            )).scalars().all()
+            # Курсоры с произвольной глубины каталога: у каждого своя страница,
+            # поэтому запросы не попадают в кэш страниц и доходят до БД
+            max_id = (await session.execute(select(func.max(models.Card.id)))).scalar() or 0
+            sample = self.rng.sample(range(1, max_id + 1), min(max_id, 200))
+            rows = (await session.execute(
+                select(models.Card.created_at, models.Card.id).where(models.Card.id.in_(sample))
+            )).all()
+        self.random_cursors = [crud.encode_card_cursor(created_at, card_id) for created_at, card_id in rows]
+
+        for username in usernames:
+            response = await self.client.post(
+                "/auth/login", data={"username": username, "password": BENCH_PASSWORD}
+            )
+            response.raise_for_status()
+            self.tokens.append(response.json()["access_token"])
+        self.usernames = usernames
+
+        # Курсоры глубоких страниц для keyset-пагинации
+        cursor = None
+        for _ in range(self.args.deep_pages):
+            params = {"limit": 100}
+            if cursor:
+                params["cursor"] = cursor
+            response = await self.client.get("/cards/", params=params, headers=self.headers())
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+            self.cursors.append(cursor)
+
+    def scenarios(self) -> Dict[str, Callable[[], Awaitable]]:
+        client = self.client
+
+        async def login():
+            return await client.post("/auth/login", data={
+                "username": self.rng.choice(self.usernames), "password": BENCH_PASSWORD
+            })
+
+        async def list_cards():
+            return await client.get("/cards/", params={"limit": 100}, headers=self.headers())
+
+        async def list_cards_1000():
+            return await client.get("/cards/", params={"limit": 1000}, headers=self.headers())
+
+        async def list_cards_offset_deep():
+            skip = 100 * max(0, len(self.cursors) - 1)
+            return await client.get("/cards/", params={"skip": skip, "limit": 100}, headers=self.headers())
+
+        async def list_cards_cursor_deep():
+            params = {"limit": 100}
+            if self.cursors:
+                params["cursor"] = self.cursors[-1]
+            return await client.get("/cards/", params=params, headers=self.headers())
+
+        async def list_cards_cursor_random():
+            params = {"limit": 100}
+            if self.random_cursors:
+                params["cursor"] = self.rng.choice(self.random_cursors)
+            return await client.get("/cards/", params=params, headers=self.headers())
+
+        async def get_card():
+            return await client.get(f"/cards/{self.rng.choice(self.card_ids)}", headers=self.headers())
+
+        async def search():
+            return await client.get("/cards/search", params={"q": self.rng.choice(WORDS)}, headers=self.headers())
+
+        async def test_fetch():
+            return await client.get("/progress/test", params={"limit": 10}, headers=self.headers())
+
+        async def test_fetch_random():
+            return await client.get("/progress/test", params={"limit": 10, "mode": "random"}, headers=self.headers())
+
+        async def submit():
+            answers = [
+                {"card_id": card_id, "user_answer": self.rng.choice(WORDS)}
+                for card_id in self.rng.sample(self.card_ids, min(20, len(self.card_ids)))
+            ]
+            return await client.post(
+                "/progress/test",
+                json={"answers": answers, "duration_seconds": 60},
+                headers=self.headers(),
+            )
+
+        async def stats():
+            return await client.get("/progress/", headers=self.headers())
+
+        return {
+            "login": login,
+            "list_cards": list_cards,
+            "list_cards_1000": list_cards_1000,
+            "list_cards_offset_deep": list_cards_offset_deep,
+            "list_cards_cursor_deep": list_cards_cursor_deep,
+            "list_cards_cursor_random": list_cards_cursor_random,
+            "get_card": get_card,
+            "search": search,
+            "test_fetch": test_fetch,
+            "test_fetch_random": test_fetch_random,
+            "submit": submit,
+            "stats": stats,
+        }
+
+    async def run_scenario(self, name: str, call: Callable[[], Awaitable]) -> dict:
+        latencies: List[float] = []
+        errors = 0
+        remaining = self.args.requests
+        queries_before = self.counter.count if self.counter else 0
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                response = await call()
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "requests": len(latencies),
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        }
+        if self.counter:
+            result["queries_per_request"] = round(
+                (self.counter.count - queries_before) / max(1, len(latencies)), 2
+            )
+        return result
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+def compare(current: dict, baseline: dict):
+    print(f"\n{'scenario':<26}{'p50 before':>12}{'p50 after':>12}{'change':>10}{'rps before':>12}{'rps after':>12}")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        change = (result["p50_ms"] / before["p50_ms"] - 1) * 100 if before["p50_ms"] else 0.0
+        print(
+            f"{name:<26}{before['p50_ms']:>12.2f}{result['p50_ms']:>12.2f}{change:>+9.1f}%"
+            f"{before['throughput_rps']:>12.1f}{result['throughput_rps']:>12.1f}"
+        )
+
+async def main(args) -> dict:
+    import httpx
+
+    from app.database import engine, read_engine
+    from app.main import app, lifespan
+
+    async with lifespan(app):
+        if not args.skip_seed:
+            print("🌱 Seeding database...")
+            seeded = await seed(args)
+        else:
+            seeded = {}
+
+        counter = None
+        if args.base_url:
+            client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+        else:
+            transport = httpx.ASGITransport(app=app)
+            client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+        async with client:
+            bench = Bench(client, None, args)
+            await bench.prepare()
+            if not args.base_url:
+                bench.counter = counter = QueryCounter([engine, read_engine])
+
+            selected = args.scenarios.split(",") if args.scenarios else None
+            results = {}
+            for name, call in bench.scenarios().items():
+                if selected and name not in selected:
+                    continue
+                for _ in range(args.warmup):
+                    await call()
+                results[name] = await bench.run_scenario(name, call)
+                row = results[name]
+                print(
+                    f"{name:<26} p50 {row['p50_ms']:>8.2f} ms  p95 {row['p95_ms']:>8.2f} ms  "
+                    f"p99 {row['p99_ms']:>8.2f} ms  {row['throughput_rps']:>8.1f} rps  "
+                    f"queries/req {row.get('queries_per_request', '-')}  errors {row['errors']}"
+                )
+
+            if counter:
+                counter.close()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "database_url": os.environ.get("DATABASE_URL"),
+            "sqlite_profile": os.environ.get("SQLITE_PROFILE", "default"),
+            "mode": args.base_url or "asgi",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seeded": seeded,
+        },
+        "scenarios": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Foreign Words API")
+    parser.add_argument("--users", type=int, default=20, help="users to create")
+    parser.add_argument("--cards", type=int, default=5000, help="cards to create")
+    parser.add_argument("--progress", type=int, default=100, help="progress rows per user")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5, help="warm-up requests per scenario")
+    parser.add_argument("--sessions", type=int, default=10, help="users logged in for the run")
+    parser.add_argument("--deep-pages", type=int, default=50, help="cursor pages to walk for deep pagination")
+    parser.add_argument("--scenarios", help="comma-separated subset of scenarios")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL or a temporary SQLite file")
+    parser.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Настройки БД читаются при импорте app.database, поэтому задаются заранее
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    elif "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ.setdefault("SQL_ECHO", "false")
+    # Бенчмарк измеряет сервер, а не лимиты частоты запросов
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    results = asyncio.run(main(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"✅ Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    sys.exit(0)
@@ -0,0 +1,86 @@
+"""Общие фикстуры: временная SQLite-БД и ASGI-клиент с lifespan приложения"""
+import os
+import tempfile
+from contextlib import contextmanager
+from itertools import count
+
+# Настройки читаются при импорте app.*, поэтому задаются до него
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp_dir}/test.db"
+os.environ["SQL_ECHO"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+from app.main import app, lifespan
+from app.database import engine, read_engine
+
+_usernames = count(1)
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def client():
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+            yield http_client
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> dict:
+    response = await client.post("/auth/login", data={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+async def admin_headers(client):
+    return await login(client, "admin", "admin123")
+
+@pytest.fixture
+async def user_headers(client):
+    username = f"user{next(_usernames)}"
+    response = await client.post(
+        "/auth/register",
+        json={"username": username, "email": f"{username}@example.com", "password": "password1"},
+    )
+    assert response.status_code == 201, response.text
+    return await login(client, username, "password1")
+
+async def create_cards(client: httpx.AsyncClient, headers: dict, total: int, prefix: str = "word") -> list:
+    cards = []
+    for i in range(total):
+        response = await client.post(
+            "/cards/",
+            json={"foreign_word": f"{prefix}{i}", "translation": f"{prefix} translation {i}"},
+            headers=headers,
+        )
+        assert response.status_code == 201, response.text
+        cards.append(response.json())
+    return cards
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+@contextmanager
+def count_queries():
+    """Считать SQL-запросы к основной БД и реплике через события движка"""
+    counter = QueryCounter()
+    engines = {engine.sync_engine, read_engine.sync_engine}
+    for sync_engine in engines:
+        event.listen(sync_engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        for sync_engine in engines:
+            event.remove(sync_engine, "before_cursor_execute", counter)
@@ -0,0 +1,92 @@
+"""Выдача новых карточек в режиме mode=due"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app import crud, models
+from app.database import AsyncSessionLocal
+from conftest import create_cards
+
+pytestmark = pytest.mark.anyio
+
+async def _catalog_ids(client, headers):
+    ids = []
+    params = {"limit": 1000}
+    while True:
+        response = await client.get("/cards/", params=params, headers=headers)
+        ids.extend(card["id"] for card in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            return sorted(ids)
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+async def _pointer(user_id):
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(
+            select(models.NewCardPointer.last_card_id).where(models.NewCardPointer.user_id == user_id)
+        )).scalar_one_or_none()
+
+async def test_new_cards_are_introduced_in_id_order(client, admin_headers, user_headers):
+    await create_cards(client, admin_headers, 12, prefix="due")
+    catalog_ids = await _catalog_ids(client, admin_headers)
+    user_id = (await client.get("/auth/me", headers=user_headers)).json()["id"]
+
+    response = await client.get("/progress/test?limit=5", headers=user_headers)
+    first = response.json()
+    assert [card["id"] for card in first] == catalog_ids[:5]
+    assert all(card["user_progress"] is None for card in first)
+    assert await _pointer(user_id) == catalog_ids[4]
+
+    # Выданные без ответа карточки остаются в выдаче, новые не добавляются
+    response = await client.get("/progress/test?limit=5", headers=user_headers)
+    assert sorted(card["id"] for card in response.json()) == catalog_ids[:5]
+
+    answers = [{"card_id": card["id"], "user_answer": card["translation"]} for card in first]
+    response = await client.post("/progress/test", json={"answers": answers, "duration_seconds": 10}, headers=user_headers)
+    assert response.json()["correct_answers"] == 5
+
+    response = await client.get("/progress/test?limit=5", headers=user_headers)
+    assert [card["id"] for card in response.json()] == catalog_ids[5:10]
+    assert await _pointer(user_id) == catalog_ids[9]
+
+async def test_studied_cards_are_skipped_once(client, admin_headers, user_headers):
+    await create_cards(client, admin_headers, 6, prefix="skip")
+    catalog_ids = await _catalog_ids(client, admin_headers)
+    user_id = (await client.get("/auth/me", headers=user_headers)).json()["id"]
+
+    # Всё, кроме последней карточки, уже изучено (например, в mode=random)
+    answers = [{"card_id": card_id, "user_answer": "?"} for card_id in catalog_ids[:-1]]
+    await client.post("/progress/test", json={"answers": answers, "duration_seconds": 10}, headers=user_headers)
+
+    response = await client.get("/progress/test?limit=3", headers=user_headers)
+    ids = [card["id"] for card in response.json()]
+    # Сначала единственная новая карточка, затем ближайшие к сроку
+    assert ids[0] == catalog_ids[-1]
+    assert len(ids) == 3 and set(ids[1:]) <= set(catalog_ids[:-1])
+    assert await _pointer(user_id) == catalog_ids[-1]
+
+async def test_new_cards_are_not_repeated_as_upcoming(client, admin_headers, user_headers, monkeypatch):
+    await create_cards(client, admin_headers, 3, prefix="tick")
+    catalog_ids = await _catalog_ids(client, admin_headers)
+    user_id = (await client.get("/auth/me", headers=user_headers)).json()["id"]
+    # Пользователь уже видел всё, кроме трёх последних карточек
+    async with AsyncSessionLocal() as session:
+        session.add(models.NewCardPointer(user_id=user_id, last_card_id=catalog_ids[-4]))
+        await session.commit()
+
+    # Часы сдвигаются на секунду при каждом обращении: новые карточки
+    # не должны получить срок позже now выборки и вернуться второй раз
+    class TickingClock(datetime):
+        now = datetime.utcnow()
+
+        @classmethod
+        def utcnow(cls):
+            cls.now += timedelta(seconds=1)
+            return cls.now
+
+    monkeypatch.setattr(crud, "datetime", TickingClock)
+    async with AsyncSessionLocal() as session:
+        cards = await crud.get_due_cards_for_user(session, user_id, limit=10)
+
+    ids = [card.id for card in cards]
+    assert ids == catalog_ids[-3:]
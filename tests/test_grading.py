@@ -0,0 +1,131 @@
+"""Проверка ответов: нормализация, варианты перевода и индекс в воркерах"""
+import asyncio
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from app import grading, models
+from app.cache import TTLCache
+from app.database import AsyncSessionLocal
+from conftest import create_cards
+
+async def _submit(client, headers, answers):
+    response = await client.post(
+        "/progress/test", json={"answers": answers, "duration_seconds": 5}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+@pytest.mark.anyio
+async def test_card_deleted_elsewhere_is_skipped(client, admin_headers, user_headers):
+    gone, kept = await create_cards(client, admin_headers, 2, prefix="gone")
+    # Удаление в другом воркере: индекс этого процесса о нём не знает
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(models.Card).where(models.Card.id == gone["id"]))
+        await session.commit()
+
+    result = await _submit(client, user_headers, [
+        {"card_id": gone["id"], "user_answer": gone["translation"]},
+        {"card_id": kept["id"], "user_answer": kept["translation"]},
+    ])
+
+    assert result["total_questions"] == 2
+    assert result["correct_answers"] == 1
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(
+            select(models.UserCardProgress.card_id)
+            .where(models.UserCardProgress.card_id.in_([gone["id"], kept["id"]]))
+        )).scalars().all()
+        assert (await grading.get_answers(session, [gone["id"]])) == {}
+    assert rows == [kept["id"]]
+
+@pytest.mark.anyio
+async def test_index_entries_expire(client, admin_headers, user_headers, monkeypatch):
+    monkeypatch.setattr(grading, "_index", TTLCache(maxsize=100, ttl=0.05))
+    card = (await create_cards(client, admin_headers, 1, prefix="ttl"))[0]
+    assert (await _submit(client, user_headers, [
+        {"card_id": card["id"], "user_answer": card["translation"]},
+    ]))["correct_answers"] == 1
+
+    # Правка перевода в другом воркере
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(models.Card).where(models.Card.id == card["id"]).values(translation="renamed")
+        )
+        await session.commit()
+    await asyncio.sleep(0.1)
+
+    result = await _submit(client, user_headers, [
+        {"card_id": card["id"], "user_answer": "renamed"},
+    ])
+    assert result["correct_answers"] == 1
+
+@pytest.mark.parametrize("text, expected", [
+    ("House", "house"),
+    ("  big   house ", "big house"),
+    ("Café", "cafe"),
+    ("naïve", "naive"),
+    ("Straße", "strasse"),
+    ("ﬁle", "file"),
+    ("Йогурт", "йогурт"),
+    ("Ёлка", "ёлка"),
+    ("чай", "чай"),
+])
+def test_normalize(text, expected):
+    assert grading.normalize(text) == expected
+
+def test_cyrillic_short_i_and_yo_are_distinct_letters():
+    assert not grading.is_correct("мои", grading.accepted_answers("мой"))
+    assert not grading.is_correct("все", grading.accepted_answers("всё"))
+    assert grading.is_correct("Всё", grading.accepted_answers("всё"))
+
+@pytest.mark.parametrize("translation, expected", [
+    ("house", {"house"}),
+    ("house, home", {"house, home", "house", "home"}),
+    ("house;home", {"house;home", "house", "home"}),
+    ("house / home", {"house / home", "house", "home"}),
+    ("1,000", {"1,000"}),
+    ("1,000, thousand", {"1,000, thousand", "1,000", "thousand"}),
+    ("2, 3", {"2, 3", "2", "3"}),
+])
+def test_accepted_answers(translation, expected):
+    assert grading.accepted_answers(translation) == frozenset(expected)
+
+@pytest.mark.parametrize("answer, translation, expected", [
+    ("house", "house", True),
+    ("HOUSE ", "house", True),
+    ("home", "house, home", True),
+    ("cafe", "Café", True),
+    ("big  house", "big house", True),
+    ("", "house", False),
+    ("hous", "house", False),
+    ("1", "1,000", False),
+])
+def test_is_correct_exact(answer, translation, expected):
+    assert grading.is_correct(answer, grading.accepted_answers(translation)) is expected
+
+@pytest.mark.parametrize("answer, translation, expected", [
+    ("hous", "house", True),         # пропущена буква
+    ("huose", "house", False),       # перестановка — две правки
+    ("housee", "house", True),       # лишняя буква
+    ("hoose", "house", True),        # замена
+    ("hse", "house", False),         # две правки
+    ("cta", "cat", False),           # короче GRADING_FUZZY_MIN_LENGTH
+    ("ca", "cat", False),
+    ("elefant", "elephant, animal", False),
+    ("elephnt", "elephant, animal", True),
+])
+def test_is_correct_fuzzy(answer, translation, expected, monkeypatch):
+    monkeypatch.setattr(grading, "GRADING_MAX_EDITS", 1)
+    monkeypatch.setattr(grading, "GRADING_FUZZY_MIN_LENGTH", 5)
+    assert grading.is_correct(answer, grading.accepted_answers(translation)) is expected
+
+@pytest.mark.parametrize("a, b, k, expected", [
+    ("kitten", "sitting", 3, True),
+    ("kitten", "sitting", 2, False),
+    ("", "abc", 3, True),
+    ("abc", "abc", 0, True),
+    ("abc", "abd", 0, False),
+])
+def test_within_edits(a, b, k, expected):
+    assert grading._within_edits(a, b, k) is expected
@@ -0,0 +1,57 @@
+"""Заголовки HTTP: CORS, сжатие и Cache-Control"""
+import pytest
+
+from conftest import create_cards
+
+pytestmark = pytest.mark.anyio
+
+async def test_cors_exposes_cursor_and_etag(client, admin_headers, user_headers):
+    await create_cards(client, admin_headers, 3, prefix="cors")
+
+    response = await client.get(
+        "/cards/?limit=2", headers={**user_headers, "Origin": "https://example.com"}
+    )
+
+    assert response.status_code == 200
+    assert "X-Next-Cursor" in response.headers
+    exposed = {name.strip().lower() for name in response.headers["access-control-expose-headers"].split(",")}
+    assert {"x-next-cursor", "etag"} <= exposed
+
+async def test_card_list_gzip_is_smaller_than_identity(client, admin_headers, user_headers):
+    await create_cards(client, admin_headers, 30, prefix="gzip")
+
+    identity = await client.get(
+        "/cards/?limit=30", headers={**user_headers, "Accept-Encoding": "identity"}
+    )
+    gzipped = await client.get(
+        "/cards/?limit=30", headers={**user_headers, "Accept-Encoding": "gzip"}
+    )
+
+    assert "content-encoding" not in identity.headers
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.json() == identity.json()
+    # num_bytes_downloaded — размер тела до распаковки
+    assert gzipped.num_bytes_downloaded < identity.num_bytes_downloaded
+
+async def test_progress_is_private_and_not_stored(client, user_headers):
+    response = await client.get("/progress/", headers=user_headers)
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "private, no-store"
+
+async def test_catalog_requires_revalidation(client, user_headers):
+    response = await client.get("/cards/", headers=user_headers)
+
+    assert response.headers["cache-control"] == "private, no-cache"
+
+async def test_non_get_requests_are_not_stored(client, admin_headers):
+    created = await client.post(
+        "/cards/", json={"foreign_word": "store", "translation": "none"}, headers=admin_headers
+    )
+    updated = await client.put(
+        f"/cards/{created.json()['id']}", json={"translation": "still none"}, headers=admin_headers
+    )
+    deleted = await client.delete(f"/cards/{created.json()['id']}", headers=admin_headers)
+
+    for response in (created, updated, deleted):
+        assert response.headers["cache-control"] == "no-store"
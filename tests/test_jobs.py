@@ -0,0 +1,50 @@
+"""Восстановление фоновых задач: только задачи без живого владельца"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import jobs, models
+from app.database import AsyncSessionLocal
+
+pytestmark = pytest.mark.anyio
+
+async def _running_job(heartbeat_at):
+    async with AsyncSessionLocal() as session:
+        job = models.Job(
+            kind="rebuild_stats",
+            status=jobs.RUNNING,
+            owner="other-worker:1:0",
+            started_at=heartbeat_at,
+            heartbeat_at=heartbeat_at,
+        )
+        session.add(job)
+        await session.commit()
+        return job.id
+
+async def _job(job_id):
+    async with AsyncSessionLocal() as session:
+        return await jobs.get_job(session, job_id)
+
+async def test_job_of_live_worker_is_not_requeued(client):
+    job_id = await _running_job(datetime.utcnow())
+
+    await jobs.recover()
+
+    job = await _job(job_id)
+    assert job.status == jobs.RUNNING
+    assert job.owner == "other-worker:1:0"
+
+async def test_job_with_expired_lease_is_requeued_and_run(client):
+    expired = datetime.utcnow() - timedelta(seconds=jobs.JOB_LEASE_SECONDS * 2)
+    job_id = await _running_job(expired)
+
+    assert await jobs.recover() == 1
+
+    for _ in range(100):
+        job = await _job(job_id)
+        if job.status == jobs.SUCCEEDED:
+            break
+        await asyncio.sleep(0.02)
+    assert job.status == jobs.SUCCEEDED
+    assert job.owner == jobs.WORKER_ID
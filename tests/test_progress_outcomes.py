@@ -0,0 +1,61 @@
+"""Пакетная запись результатов ответов (crud.apply_progress_outcomes)"""
+import pytest
+from sqlalchemy import func, select
+
+from app import crud, models, schemas
+from app.database import AsyncSessionLocal
+
+pytestmark = pytest.mark.anyio
+
+async def _new_card_ids(total, prefix):
+    async with AsyncSessionLocal() as session:
+        last_id = (await session.execute(select(func.max(models.Card.id)))).scalar() or 0
+        await crud.bulk_create_cards(
+            session,
+            [schemas.CardCreate(foreign_word=f"{prefix}{i}", translation=f"{prefix}{i}") for i in range(total)],
+            admin_id=1,
+        )
+        return list((await session.execute(
+            select(models.Card.id).where(models.Card.id > last_id).order_by(models.Card.id)
+        )).scalars().all())
+
+async def _progress(user_id, card_ids):
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(models.UserCardProgress).where(
+                models.UserCardProgress.user_id == user_id,
+                models.UserCardProgress.card_id.in_(card_ids),
+            )
+        )
+        return {row.card_id: row for row in result.scalars().all()}
+
+async def test_large_batch_is_split_into_chunks(client, user_headers, monkeypatch):
+    monkeypatch.setattr(crud, "PROGRESS_CHUNK_ROWS", 100)
+    user_id = (await client.get("/auth/me", headers=user_headers)).json()["id"]
+    card_ids = await _new_card_ids(250, "chunk")
+
+    async with AsyncSessionLocal() as session:
+        await crud.apply_progress_outcomes(
+            session, {(user_id, card_id): [True, False] for card_id in card_ids}
+        )
+
+    rows = await _progress(user_id, card_ids)
+    assert len(rows) == 250
+    assert all(row.total_attempts == 2 and row.correct_answers == 1 for row in rows.values())
+    stats = (await client.get("/progress/", headers=user_headers)).json()
+    assert stats["total_reviews"] == 500
+
+async def test_review_state_is_read_per_pair(client, user_headers):
+    user_id = (await client.get("/auth/me", headers=user_headers)).json()["id"]
+    first, second = await _new_card_ids(2, "pair")
+
+    async with AsyncSessionLocal() as session:
+        await crud.apply_progress_outcomes(session, {(1, first): [True, True], (user_id, second): [True]})
+    # Пары (1, second) и (user_id, first) новые: их расписание начинается с нуля
+    async with AsyncSessionLocal() as session:
+        await crud.apply_progress_outcomes(session, {(1, second): [True], (user_id, first): [True]})
+
+    assert (await _progress(1, [first]))[first].streak == 2
+    assert (await _progress(1, [second]))[second].streak == 1
+    assert (await _progress(user_id, [first]))[first].streak == 1
+    assert (await _progress(user_id, [second]))[second].streak == 1
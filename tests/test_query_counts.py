@@ -0,0 +1,42 @@
+"""Число запросов к БД не зависит от размера страницы"""
+import pytest
+
+from conftest import count_queries, create_cards
+
+pytestmark = pytest.mark.anyio
+
+async def _get_counted(client, url, headers):
+    # Первый запрос прогревает кэш пользователей авторизации
+    await client.get("/auth/me", headers=headers)
+    with count_queries() as counter:
+        response = await client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return response, counter.count
+
+async def test_card_list_query_count_is_fixed(client, admin_headers, user_headers):
+    await create_cards(client, admin_headers, 30, prefix="list")
+
+    small, small_queries = await _get_counted(client, "/cards/?limit=5", user_headers)
+    large, large_queries = await _get_counted(client, "/cards/?limit=25", user_headers)
+
+    assert len(small.json()) == 5
+    assert len(large.json()) == 25
+    # Страница каталога и прогресс пользователя по ней
+    assert small_queries == large_queries == 2
+
+@pytest.mark.parametrize("params", ["limit=0", "limit=1001", "skip=-1"])
+async def test_card_list_page_size_is_bounded(client, user_headers, params):
+    response = await client.get(f"/cards/?{params}", headers=user_headers)
+
+    assert response.status_code == 422
+
+async def test_test_cards_query_count_is_fixed(client, admin_headers, user_headers):
+    await create_cards(client, admin_headers, 30, prefix="quiz")
+
+    small, small_queries = await _get_counted(client, "/progress/test?limit=5&mode=random", user_headers)
+    large, large_queries = await _get_counted(client, "/progress/test?limit=25&mode=random", user_headers)
+
+    assert len(small.json()) == 5
+    assert len(large.json()) == 25
+    # Попытки по каталогу, карточки выборки и прогресс по ним
+    assert small_queries == large_queries == 3
@@ -0,0 +1,32 @@
+"""Горячие запросы crud не делают полных проходов по таблицам"""
+import pytest
+from sqlalchemy import func, select
+
+from app import migrations, models
+from app.database import AsyncSessionLocal
+from conftest import create_cards
+
+pytestmark = pytest.mark.anyio
+
+async def _progress_rows(user_id):
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(
+            select(func.count()).select_from(models.UserCardProgress)
+            .where(models.UserCardProgress.user_id == user_id)
+        )).scalar()
+
+async def test_hot_queries_use_indexes(client, admin_headers):
+    cards = await create_cards(client, admin_headers, 20, prefix="plan")
+    # У администратора (user_id=1, его берут запросы проверки) есть прогресс
+    answers = [{"card_id": card["id"], "user_answer": "?"} for card in cards[:5]]
+    response = await client.post(
+        "/progress/test", json={"answers": answers, "duration_seconds": 5}, headers=admin_headers
+    )
+    assert response.status_code == 200
+    rows_before = await _progress_rows(1)
+
+    problems = await migrations.check_query_plans()
+
+    assert problems == []
+    # Выдача новых карточек во время проверки откатывается
+    assert await _progress_rows(1) == rows_before
@@ -0,0 +1,53 @@
+"""Выборка карточек для теста совпадает по распределению с прежней"""
+import random
+from collections import Counter
+
+from app import crud
+
+# (card_id, attempts): веса 10, 5, 3, 2, 2, 1, 0, 0
+ROWS = [(1, 0), (2, 1), (3, 2), (4, 3), (5, 4), (6, 9), (7, 10), (8, 20)]
+LIMIT = 3
+TRIALS = 20000
+# Критическое значение хи-квадрат для 5 степеней свободы, p = 0.001
+CHI2_CRITICAL_DF5 = 20.515
+
+def _copy_list_sample(rows, limit, rng):
+    """Прежняя реализация: random.sample по списку копий карточек"""
+    weighted = []
+    for card_id, attempts in rows:
+        weighted.extend([card_id] * int(10 / (attempts + 1)))
+    if not weighted:
+        return rng.sample([card_id for card_id, _ in rows], min(limit, len(rows)))
+    return rng.sample(weighted, min(limit, len(weighted)))
+
+def _frequencies(sample, seed):
+    rng = random.Random(seed)
+    counts = Counter()
+    for _ in range(TRIALS):
+        counts.update(sample(ROWS, LIMIT, rng))
+    return counts
+
+def test_weighted_sampler_matches_copy_list_reference():
+    observed = _frequencies(crud._sample_weighted_card_ids, seed=1)
+    reference = _frequencies(_copy_list_sample, seed=2)
+
+    # Карточки с нулевым весом не выбираются ни одной реализацией
+    assert observed[7] == observed[8] == reference[7] == reference[8] == 0
+
+    # Хи-квадрат однородности двух выборок одинакового размера
+    categories = [card_id for card_id, _ in ROWS if reference[card_id]]
+    assert len(categories) == 6
+    chi2 = 0.0
+    for card_id in categories:
+        total = observed[card_id] + reference[card_id]
+        expected = total / 2
+        chi2 += (observed[card_id] - expected) ** 2 / expected
+        chi2 += (reference[card_id] - expected) ** 2 / expected
+
+    assert chi2 < CHI2_CRITICAL_DF5
+
+def test_zero_weights_fall_back_to_uniform_sample():
+    rows = [(1, 10), (2, 11), (3, 12)]
+    chosen = crud._sample_weighted_card_ids(rows, 2, random.Random(0))
+    assert len(chosen) == 2
+    assert set(chosen) <= {1, 2, 3}
@@ -0,0 +1,89 @@
+"""Ограничение частоты: оба хранилища и заголовки ответов"""
+import pytest
+
+from app import ratelimit
+from app.ratelimit import LocalStore, MemoryBackend, RateLimit, SharedStoreBackend
+
+pytestmark = pytest.mark.anyio
+
+LIMIT = RateLimit(requests=2, period=60)
+
+class Clock:
+    def __init__(self, now: float = 600.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture(params=["memory", "local"])
+def backend(request):
+    clock = Clock()
+    if request.param == "memory":
+        return MemoryBackend(clock=clock), clock
+    return SharedStoreBackend(LocalStore(), clock=clock), clock
+
+async def test_allows_requests_up_to_the_limit(backend):
+    limiter, _ = backend
+
+    first = await limiter.hit("key", LIMIT)
+    second = await limiter.hit("key", LIMIT)
+
+    assert first.allowed and second.allowed
+    assert (first.remaining, second.remaining) == (1, 0)
+    assert second.headers() == {
+        "X-RateLimit-Limit": "2",
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": str(int(LIMIT.period)),
+    }
+
+async def test_denies_over_the_limit_with_retry_after(backend):
+    limiter, _ = backend
+    for _ in range(LIMIT.requests):
+        await limiter.hit("key", LIMIT)
+
+    denied = await limiter.hit("key", LIMIT)
+
+    assert not denied.allowed
+    assert denied.remaining == 0
+    # Скользящему окну может понадобиться больше периода: запросы
+    # текущего окна ещё учитываются в следующем
+    assert 0 < denied.retry_after <= 2 * LIMIT.period
+    assert denied.headers()["Retry-After"] == str(int(denied.retry_after))
+
+async def test_keys_are_limited_separately(backend):
+    limiter, _ = backend
+    for _ in range(LIMIT.requests):
+        await limiter.hit("key", LIMIT)
+
+    assert (await limiter.hit("other", LIMIT)).allowed
+
+async def test_denied_requests_are_not_charged(backend):
+    limiter, clock = backend
+    for _ in range(LIMIT.requests):
+        await limiter.hit("key", LIMIT)
+
+    first_denied = await limiter.hit("key", LIMIT)
+    for _ in range(10):
+        denied = await limiter.hit("key", LIMIT)
+
+    assert denied.retry_after == first_denied.retry_after
+    clock.now += denied.retry_after - 1
+    assert not (await limiter.hit("key", LIMIT)).allowed
+    clock.now += 1
+    assert (await limiter.hit("key", LIMIT)).allowed
+
+async def test_headers_survive_handler_errors(client, monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(ratelimit, "_backend", MemoryBackend())
+    limit = RateLimit.parse(ratelimit.RATE_LIMIT_LOGIN)
+
+    for attempt in range(limit.requests):
+        response = await client.post("/auth/login", data={"username": "admin", "password": "wrong"})
+        assert response.status_code == 401
+        assert response.headers["X-RateLimit-Limit"] == str(limit.requests)
+        assert response.headers["X-RateLimit-Remaining"] == str(limit.requests - attempt - 1)
+        assert "WWW-Authenticate" in response.headers
+
+    response = await client.post("/auth/login", data={"username": "admin", "password": "wrong"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
@@ -0,0 +1,60 @@
+"""Чтение с реплики: отставание реплики не попадает в кэш каталога"""
+import shutil
+
+import pytest
+from sqlalchemy.engine import make_url
+
+from app import database
+from conftest import create_cards
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def replica(monkeypatch, tmp_path):
+    """Реплика — копия основной SQLite-БД, которая дальше не обновляется"""
+    replica_path = tmp_path / "replica.db"
+
+    def snapshot():
+        shutil.copyfile(make_url(database.DATABASE_URL).database, replica_path)
+
+    snapshot()
+    replica_engine = database._create_engine(f"sqlite+aiosqlite:///{replica_path}")
+    monkeypatch.setattr(database, "ReadSessionLocal", database._create_sessionmaker(replica_engine))
+    yield snapshot
+    await replica_engine.dispose()
+
+async def _user_id(client, headers):
+    response = await client.get("/auth/me", headers=headers)
+    return response.json()["id"]
+
+async def test_card_update_is_not_cached_from_lagging_replica(client, admin_headers, user_headers, replica):
+    card = (await create_cards(client, admin_headers, 1, prefix="lag"))[0]
+    replica()
+    database._recent_writers.clear()
+
+    response = await client.get(f"/cards/{card['id']}", headers=user_headers)
+    assert response.json()["translation"] == card["translation"]
+
+    response = await client.put(
+        f"/cards/{card['id']}", json={"translation": "fresh"}, headers=admin_headers
+    )
+    assert response.status_code == 200
+
+    # Реплика ещё хранит старый перевод, но кэш заполняется из основной БД
+    response = await client.get(f"/cards/{card['id']}", headers=user_headers)
+    assert response.json()["translation"] == "fresh"
+    response = await client.get("/cards/?limit=100", headers=user_headers)
+    assert {c["id"]: c["translation"] for c in response.json()}[card["id"]] == "fresh"
+
+async def test_card_writes_mark_the_admin_as_recent_writer(client, admin_headers, replica):
+    admin_id = await _user_id(client, admin_headers)
+    card = (await create_cards(client, admin_headers, 1, prefix="mark"))[0]
+
+    database._recent_writers.clear()
+    await client.put(f"/cards/{card['id']}", json={"translation": "changed"}, headers=admin_headers)
+    assert database.read_sessionmaker_for(admin_id) is database.AsyncSessionLocal
+
+    database._recent_writers.clear()
+    response = await client.delete(f"/cards/{card['id']}", headers=admin_headers)
+    assert response.status_code == 204
+    assert database.read_sessionmaker_for(admin_id) is database.AsyncSessionLocal